@@ -0,0 +1,176 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import Updatedmastertemplate as umt
+
+# Overlapped walk -> read -> parse pipeline for high-latency (network) storage.
+# Directory listings and file reads run in a thread pool, parsing in a process pool,
+# connected by bounded queues so a slow stage throttles the ones feeding it. Bytes read
+# ahead of the parsers are capped by a byte budget, not by the number of queued files.
+
+DONE = None  # Queue sentinel
+READ_AHEAD_BYTES = 256 << 20  # Default budget for read but not yet parsed CSV bytes
+
+def scan_directory(dir_path):
+    """List a directory as (files, subdirectories) in os.walk order."""
+    files, dirs = [], []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            (dirs if entry.is_dir() else files).append(entry.name)
+    return files, dirs
+
+def read_source(source):
+    """Read a loose CSV or ZIP member fully into memory."""
+    with umt.open_source_bytes(source) as f:
+        return f.read()
+
+def new_byte_budget(max_bytes):
+    """Byte budget shared by the readers (reserve) and parsers (release)."""
+    return {"max_bytes": max_bytes, "available": max_bytes, "changed": asyncio.Condition()}
+
+async def reserve_bytes(budget, size):
+    """Wait until size bytes fit in the budget; a CSV larger than the whole budget waits for it to empty."""
+    size = min(size, budget["max_bytes"])
+    async with budget["changed"]:
+        await budget["changed"].wait_for(lambda: budget["available"] >= size)
+        budget["available"] -= size
+    return size
+
+async def release_bytes(budget, size):
+    async with budget["changed"]:
+        budget["available"] += size
+        budget["changed"].notify_all()
+
+async def walk_operator(operator, operator_path, read_queue, scan_limit):
+    """Queue every CSV of an operator, scanning subdirectories concurrently.
+
+    Each entry carries a key that sorts like os.walk order, so results can be put
+    back in the order collect_operator_csvs would produce.
+    """
+    async def walk(dir_path, key):
+        async with scan_limit:
+            files, dirs = await asyncio.to_thread(scan_directory, dir_path)
+
+        for position, file in enumerate(files):
+            file_path = os.path.join(dir_path, file)
+            if file.endswith(".zip"):
+                async with scan_limit:
+                    members = await asyncio.to_thread(umt.list_zip_csvs, file_path)
+                for member_position, (name, source) in enumerate(members):
+                    await read_queue.put((operator, key + (0, position, member_position), name, source))
+            elif file.endswith(".csv"):
+                await read_queue.put((operator, key + (0, position), file, file_path))
+
+        await asyncio.gather(*(
+            walk(os.path.join(dir_path, subdir), key + (1, position)) for position, subdir in enumerate(dirs)
+        ))
+
+    await walk(operator_path, ())
+
+async def read_worker(read_queue, parse_queue, budget):
+    """Read queued sources ahead of the parsers, reserving their size before reading."""
+    while (item := await read_queue.get()) is not DONE:
+        operator, key, file, source = item
+        size = await reserve_bytes(budget, await asyncio.to_thread(umt.source_size, source))
+        data = await asyncio.to_thread(read_source, source)
+        await parse_queue.put((operator, key, file, source, data, size))
+
+async def parse_worker(parse_queue, executor, results, budget):
+    """Parse read-ahead bytes in the executor and collect (key, file, source, partial) per operator."""
+    loop = asyncio.get_running_loop()
+    while (item := await parse_queue.get()) is not DONE:
+        operator, key, file, source, data, size = item
+        partial = await loop.run_in_executor(executor, umt.parse_csv_partial, data)
+        del data, item  # Drop the bytes before handing their share of the budget back
+        await release_bytes(budget, size)
+        results[operator].append((key, file, source, partial))
+
+async def parse_all_operators(operators, parse_executor, read_concurrency=16, scan_concurrency=8,
+                              parse_concurrency=2, queue_size=64, read_ahead_bytes=READ_AHEAD_BYTES):
+    """Run the pipeline over {operator: operator_path}; return {operator: [(file, source, partial)]} in walk order.
+
+    read_concurrency files are read at once and at most queue_size entries wait
+    between stages. A file's size is reserved from read_ahead_bytes before it is
+    read and released once it is parsed, so CSV bytes held in memory stay within
+    read_ahead_bytes (or one CSV, if a single file is larger).
+    parse_concurrency should be about twice the executor's workers to keep it busy.
+    """
+    read_queue = asyncio.Queue(maxsize=queue_size)
+    parse_queue = asyncio.Queue(maxsize=queue_size)
+    scan_limit = asyncio.Semaphore(scan_concurrency)
+    budget = new_byte_budget(read_ahead_bytes)
+    results = {operator: [] for operator in operators}
+
+    readers = [asyncio.create_task(read_worker(read_queue, parse_queue, budget)) for _ in range(read_concurrency)]
+    parsers = [
+        asyncio.create_task(parse_worker(parse_queue, parse_executor, results, budget))
+        for _ in range(parse_concurrency)
+    ]
+    async def produce():
+        await asyncio.gather(*(
+            walk_operator(operator, operator_path, read_queue, scan_limit)
+            for operator, operator_path in operators.items()
+        ))
+        for _ in readers:
+            await read_queue.put(DONE)
+        await asyncio.gather(*readers)
+        for _ in parsers:
+            await parse_queue.put(DONE)
+
+    try:
+        await asyncio.gather(produce(), *parsers)  # A failing stage raises here instead of blocking the rest
+    finally:
+        for task in readers + parsers:
+            task.cancel()
+
+    return {
+        operator: [(file, source, partial) for _, file, source, partial in sorted(entries, key=lambda e: e[0])]
+        for operator, entries in results.items()
+    }
+
+def process_all_operators_async(base_directory, output_dir, workers=1, read_concurrency=16, scan_concurrency=8,
+                                queue_size=64, read_ahead_bytes=READ_AHEAD_BYTES):
+    """process_all_operators for high-latency storage: walking, reading and parsing overlap.
+
+    Produces the same templates, section counts and per-CSV parameter sets.
+    With workers > 1 parsing runs in a process pool, otherwise in a thread.
+    """
+    operators = {
+        operator: os.path.join(base_directory, operator)
+        for operator in os.listdir(base_directory)
+        if os.path.isdir(os.path.join(base_directory, operator))
+    }
+
+    async def run(parse_executor):
+        loop = asyncio.get_running_loop()
+        # to_thread uses the default executor; size it for the I/O concurrency
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=read_concurrency + scan_concurrency))
+        return await parse_all_operators(
+            operators, parse_executor, read_concurrency, scan_concurrency, 2 * workers, queue_size,
+            read_ahead_bytes,
+        )
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = asyncio.run(run(executor))
+    else:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            parsed = asyncio.run(run(executor))
+
+    operator_master_templates = {}
+    operator_section_counts = {}
+    operator_param_sets = {}
+
+    for operator, entries in parsed.items():
+        print(f"Processing Operator: {operator}")
+        csv_files = [(umt.source_name(operators[operator], source), source) for _, source, _ in entries]
+        section_counts, templates, csv_param_sets = umt.reduce_partials(
+            csv_files, [partial for *_, partial in entries]
+        )
+
+        operator_master_templates[operator] = umt.merge_templates(templates)
+        operator_section_counts[operator] = section_counts
+        operator_param_sets[operator] = csv_param_sets
+        umt.save_master_template(operator, operator_master_templates[operator], output_dir)
+
+    return operator_master_templates, operator_section_counts, operator_param_sets
@@ -0,0 +1,612 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then reported as None
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SIZES = {  # name: (operators, files per operator)
+    "small": (2, 50),
+    "medium": (4, 250),
+    "large": (8, 1000),
+}
+
+PIPELINE_PARSERS = ["sections", "scan", "lookahead"]  # Pipeline.PARSERS; --verify checks every entry there
+VARIANTS = [
+    "updated-serial", "updated-pool", "updated-cache-warm", "updated-async",
+    *[f"pipeline-{parser}" for parser in PIPELINE_PARSERS], "pipeline-scan-pool",
+    "mastertemplate", "newmastertemplate", "mt", "ne",
+]
+ZIP_AWARE_VARIANTS = {"updated-serial", "updated-pool", "updated-cache-warm", "updated-async"} | {
+    variant for variant in VARIANTS if variant.startswith("pipeline-")
+}
+# The other scripts extract ZIPs next to the archive after os.walk has listed the directory,
+# so they only ever parse the loose CSVs; throughput is computed over what each one parsed.
+
+def cell(text, rng, quote_ratio=0.3, tab_ratio=0.05):
+    """Render one CSV cell, sometimes quoted or with an embedded tab like real dumps."""
+    if rng.random() < tab_ratio:
+        text = text.replace("_", "\t", 1)
+    if "\n" in text or "," in text or rng.random() < quote_ratio:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+def render_csv(sections, rng, value_rows=5, multiline_ratio=0.05):
+    """Render a config dump: @section header, parameter line, then value rows per section."""
+    lines = []
+    for section, params in sections:
+        lines.append(cell(section, rng, quote_ratio=0.1, tab_ratio=0))
+
+        header = []
+        for param in params:
+            if rng.random() < multiline_ratio:  # Quoted cell spanning two physical lines
+                param = param + "\n" + "cont"
+            header.append(cell(param, rng))
+        lines.append(",".join(header))
+
+        for _ in range(value_rows):
+            values = []
+            for position in range(len(params)):
+                kind = position % 4
+                if kind == 0:
+                    values.append(str(rng.randint(0, 100000)))
+                elif kind == 1:
+                    values.append(f"{rng.random() * 1000:.3f}")
+                elif kind == 2:
+                    values.append(cell(rng.choice(["ENABLED", "DISABLED", "AUTO"]), rng))
+                else:
+                    values.append(".".join(str(rng.randint(0, 255)) for _ in range(4)))
+            lines.append(",".join(values))
+        lines.append("")
+
+    return "\n".join(lines) + "\n"
+
+def generate_corpus(base_dir, operators=2, files=50, sections=8, params=20, overlap=0.7,
+                    value_rows=5, zip_ratio=0.1, nested_ratio=0.3, seed=0):
+    """Write a synthetic operator tree and return its stats.
+
+    overlap is the fraction of each section's parameters shared by all operators;
+    zip_ratio of the CSVs are shipped inside a per-operator ZIP, nested_ratio of
+    those one level deeper in an inner ZIP.
+    """
+    rng = random.Random(seed)
+    section_names = [f"@SECTION_{i}" for i in range(sections * 2)]
+    shared = {name: [f"{name[1:]}_param_{i}" for i in range(int(params * overlap))] for name in section_names}
+    stats = {"operators": operators, "files": 0, "bytes": 0, "loose_files": 0, "loose_bytes": 0}
+
+    for operator_index in range(operators):
+        operator = f"operator_{operator_index}"
+        operator_dir = os.path.join(base_dir, operator)
+        own = {
+            name: [f"{name[1:]}_{operator}_{i}" for i in range(params - len(shared[name]))]
+            for name in section_names
+        }
+        archived, nested = [], []
+
+        for file_index in range(files):
+            chosen = rng.sample(section_names, sections)
+            content = render_csv([(name, shared[name] + own[name]) for name in chosen], rng, value_rows)
+            name = f"dump_{file_index}.csv"
+            stats["files"] += 1
+            stats["bytes"] += len(content.encode("utf-8"))
+
+            if rng.random() < zip_ratio:
+                (nested if rng.random() < nested_ratio else archived).append((name, content))
+                continue
+
+            stats["loose_files"] += 1
+            stats["loose_bytes"] += len(content.encode("utf-8"))
+            file_path = os.path.join(operator_dir, f"region_{file_index % 4}", name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+        if archived or nested:
+            os.makedirs(operator_dir, exist_ok=True)
+            with zipfile.ZipFile(os.path.join(operator_dir, "bundle.zip"), "w", zipfile.ZIP_DEFLATED) as archive:
+                for name, content in archived:
+                    archive.writestr(name, content)
+                if nested:
+                    inner = io.BytesIO()
+                    with zipfile.ZipFile(inner, "w", zipfile.ZIP_DEFLATED) as inner_archive:
+                        for name, content in nested:
+                            inner_archive.writestr(f"inner/{name}", content)
+                    archive.writestr("nested.zip", inner.getvalue())
+
+    return stats
+
+NORMALIZATION_EDGE_CASES = [  # Raw CSV snippets that have tripped up cell cleaning before
+    "@SEC\na,b\n1,2\n",
+    '@SEC\n"a, b",c\n"1","2"\n',
+    '@SEC\n" a ",\'b\',\tc\t\n x ,\t\'y\'\t, z\n',
+    '@SEC\n"multi\nline",p2\n"v\n1",v2\n',
+    "@SEC\n ' a,b' \n\n\n1,,2,\n",
+    '@SEC\nab"c,d""e\n"x""y",z\n',
+    '"@QUOTED SEC"\n"p1"\t,p2\n1\x1f2,"3\x1f4"\n',
+    "@SEC\r\np1,p2\r\n1,2\r\n",
+    "@SEC\n   \n\t\n'\n\"\n",
+    '@SEC\n"unterminated,p2\n1,2\n',
+]
+
+def reference_clean_rows(f):
+    """The original csv.reader + per-cell clean_text chain, used as ground truth."""
+    for row in csv.reader(f):
+        yield [cell.strip().replace('"', '').replace("'", "").replace("\t", " ") for cell in row]
+
+def verify_normalization(corpus_dir):
+    """Compare Updatedmastertemplate.iter_clean_rows with the reference on every CSV; returns mismatches."""
+    module = load_variant("Updatedmastertemplate.py")
+    edge_dir = os.path.join(corpus_dir, "edge_cases")
+    os.makedirs(edge_dir, exist_ok=True)
+    for i, content in enumerate(NORMALIZATION_EDGE_CASES):
+        with open(os.path.join(edge_dir, f"edge_{i}.csv"), "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+
+    checked = mismatches = 0
+    for operator in sorted(os.listdir(corpus_dir)):
+        for file, source in module["collect_operator_csvs"](os.path.join(corpus_dir, operator)):
+            with module["open_csv_source"](source) as f:
+                expected = list(reference_clean_rows(f))
+            with module["open_csv_source"](source) as f:
+                actual = list(module["iter_clean_rows"](f))
+
+            checked += 1
+            if actual != expected:
+                mismatches += 1
+                print(f"MISMATCH {operator}/{file}")
+
+    print(f"Normalization verified on {checked} CSVs: {mismatches} mismatches")
+    return mismatches
+
+SCAN_EDGE_CASES = [  # Layouts where the line scanner must fall back to csv.reader to agree with it
+    "@A\np1,p2\n1,2\n@B\np3\n3\n",
+    "@A\n\n\np1\n1\n",
+    '@A\n"p1\n@B",p2\n1,2\n@C\np3\n',
+    '@A\np1\n"1\n@B\np2"\n@C\np3\n',
+    "  @A  \r\n p1 ,p2\r\n1\r\n",
+    '"@A"\n"p1","p\'2"\n1\n',
+    "junk,row\n@A\np1\n",
+    "@A\np1\n@B\n",
+    "@A",
+    '@A\n"p1,"p2\n1\n',
+    "\ufeff@A\np1\n1\n",
+]
+
+def verify_scan(corpus_dir):
+    """Compare Updatedmastertemplate.scan_csv_partial with parse_csv_partial on every CSV; returns mismatches."""
+    module = load_variant("Updatedmastertemplate.py")
+    edge_dir = os.path.join(corpus_dir, "edge_cases")
+    os.makedirs(edge_dir, exist_ok=True)
+    for i, content in enumerate(NORMALIZATION_EDGE_CASES + SCAN_EDGE_CASES):
+        with open(os.path.join(edge_dir, f"scan_{i}.csv"), "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+
+    checked = mismatches = 0
+    for operator in sorted(os.listdir(corpus_dir)):
+        for file, source in module["collect_operator_csvs"](os.path.join(corpus_dir, operator)):
+            checked += 1
+            if module["scan_csv_partial"](source) != module["parse_csv_partial"](source):
+                mismatches += 1
+                print(f"MISMATCH {operator}/{file}")
+
+    print(f"Scanner verified on {checked} CSVs: {mismatches} mismatches")
+    return mismatches
+
+def reference_partial(parser, source, scratch):
+    """Partial for one CSV from the code each Pipeline parser replaces: parse_csv_partial, or Mt.parse_csv."""
+    module = load_variant("Updatedmastertemplate.py")
+    if parser != "lookahead":
+        return module["parse_csv_partial"](source)
+
+    path = source
+    if not isinstance(source, str):  # Mt.parse_csv only reads files; copy the ZIP member out
+        path = os.path.join(scratch, "member.csv")
+        with module["open_source_bytes"](source) as raw, open(path, "wb") as f:
+            shutil.copyfileobj(raw, f)
+
+    sections = load_variant("Mt.py")["parse_csv"](path)
+    if not sections:
+        return None, {}
+    return next(iter(sections)), {section: set(data["parameters"]) for section, data in sections.items()}
+
+def verify_pipeline(corpus_dir, workers=2):
+    """Compare Pipeline.run_pipeline, serial and pooled, with the reference parse of every parser strategy.
+
+    sections and scan must match reduce_partials over parse_csv_partial; lookahead
+    must match Mt.parse_csv. Returns the number of mismatching runs.
+    """
+    module = load_variant("Updatedmastertemplate.py")
+    pipeline = load_variant("Pipeline.py")
+    mismatches = 0
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for parser in pipeline["PARSERS"]:
+            expected = ({}, {}, {})
+            for operator in sorted(os.listdir(corpus_dir)):
+                operator_path = os.path.join(corpus_dir, operator)
+                csv_files = [
+                    (module["source_name"](operator_path, source), source)
+                    for _, source in module["collect_operator_csvs"](operator_path)
+                ]
+                partials = [reference_partial(parser, source, scratch) for _, source in csv_files]
+                counts, templates, param_sets = module["reduce_partials"](csv_files, partials)
+                expected[0][operator] = module["merge_templates"](templates)
+                expected[1][operator] = dict(counts)
+                expected[2][operator] = param_sets
+
+            for run_workers in (1, workers):
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    results = pipeline["run_pipeline"](
+                        corpus_dir, os.path.join(scratch, "out"), parser, ("count", "template", "param_sets"),
+                        run_workers,
+                    )
+                actual = (results["template"]["operators"], results["count"], results["param_sets"])
+                if actual != expected:
+                    mismatches += 1
+                    print(f"MISMATCH pipeline {parser} with {run_workers} workers")
+
+    print(f"Pipeline verified with {len(pipeline['PARSERS'])} parsers: {mismatches} mismatching runs")
+    return mismatches
+
+def shard_node(corpus_dir, output_dir, shard, shard_path):
+    """One node of verify_shards: process its shard of the corpus and save the shard result."""
+    module = load_variant("Updatedmastertemplate.py")
+    shards = load_variant("Shards.py")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = module["process_all_operators"](corpus_dir, output_dir, shard=shard)
+        shards["save_shard"](shards["shard_result"](*result), shard_path)
+
+def split_local_trees(corpus_dir, nodes, scratch):
+    """Deal each operator's top-level entries round-robin into one local tree per node."""
+    node_dirs = [os.path.join(scratch, f"node_{node}") for node in range(nodes)]
+    for operator in sorted(os.listdir(corpus_dir)):
+        for i, entry in enumerate(sorted(os.listdir(os.path.join(corpus_dir, operator)))):
+            source = os.path.join(corpus_dir, operator, entry)
+            target = os.path.join(node_dirs[i % nodes], operator, entry)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            (shutil.copytree if os.path.isdir(source) else shutil.copy2)(source, target)
+    for node_dir in node_dirs:
+        os.makedirs(node_dir, exist_ok=True)
+    return node_dirs
+
+def add_same_name_csvs(corpus_dir, scratch):
+    """Copy the corpus and give its first operator two CSVs named alike in different directories."""
+    tree = os.path.join(scratch, "corpus")
+    shutil.copytree(corpus_dir, tree)
+    operator = sorted(os.listdir(tree))[0]
+    for directory, params in (("same_name_a", "p1,p2"), ("same_name_b", "g,h")):
+        os.makedirs(os.path.join(tree, operator, directory))
+        with open(os.path.join(tree, operator, directory, "same.csv"), "w", encoding="utf-8") as f:
+            f.write(f"@SAME_NAME\n{params}\n1,2\n")
+    return tree
+
+def verify_shards(corpus_dir, nodes=3):
+    """Run `nodes` local processes as stand-ins for nodes and compare their merged shards with one run.
+
+    Both shard modes are checked: hash shares of one tree every node sees, and each
+    node processing its own local tree. The corpus gets two same-named CSVs in
+    different directories first, so per-CSV results must not be keyed by file name.
+    Returns the number of mismatching modes.
+    """
+    module = load_variant("Updatedmastertemplate.py")
+    shards = load_variant("Shards.py")
+    context = multiprocessing.get_context("spawn")
+    mismatches = 0
+
+    with tempfile.TemporaryDirectory() as scratch:
+        corpus_dir = add_same_name_csvs(corpus_dir, scratch)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            templates, counts, param_sets = module["process_all_operators"](corpus_dir, os.path.join(scratch, "single"))
+        expected = (
+            templates,
+            {operator: dict(section_counts) for operator, section_counts in counts.items()},
+            {operator: dict(csv_param_sets) for operator, csv_param_sets in param_sets.items()},
+        )
+
+        modes = {
+            "hash": [(corpus_dir, (node, nodes)) for node in range(nodes)],
+            "local": [(node_dir, "local") for node_dir in split_local_trees(corpus_dir, nodes, scratch)],
+        }
+        for mode, node_runs in modes.items():
+            shard_paths = [os.path.join(scratch, f"{mode}_{node}.json") for node in range(nodes)]
+            processes = [
+                context.Process(
+                    target=shard_node, args=(tree, os.path.join(scratch, f"{mode}_out_{node}"), shard, path)
+                )
+                for node, ((tree, shard), path) in enumerate(zip(node_runs, shard_paths))
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            if any(process.exitcode != 0 for process in processes):
+                raise RuntimeError(f"a {mode} shard process failed")
+
+            merged = shards["unpack_shard"](shards["merge_shard_files"](shard_paths))
+            if merged != expected:
+                mismatches += 1
+                print(f"MISMATCH {mode} shards")
+
+    print(f"Shards verified with {nodes} processes per mode: {mismatches} mismatching modes")
+    return mismatches
+
+def load_variant(file_name):
+    """Load one of the pipeline scripts as a module namespace without running its main().
+
+    .py scripts are imported normally so the process pool can pickle their functions.
+    """
+    import runpy
+    import importlib
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    if file_name.endswith(".py"):
+        return vars(importlib.import_module(file_name[:-3]))
+    return runpy.run_path(os.path.join(REPO_DIR, file_name))
+
+def timed(stages, name, func, *args, **kwargs):
+    """Call func and record its wall time under stages[name]."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+    return result
+
+def run_updated(corpus_dir, output_dir, workers=1):
+    """Run Updatedmastertemplate.py stage by stage."""
+    module = load_variant("Updatedmastertemplate.py")
+    stages = {}
+
+    def collect():
+        return {
+            operator: module["collect_operator_csvs"](os.path.join(corpus_dir, operator))
+            for operator in sorted(os.listdir(corpus_dir))
+            if os.path.isdir(os.path.join(corpus_dir, operator))
+        }
+
+    operator_csvs = timed(stages, "collect", collect)
+    sources = [source for csv_files in operator_csvs.values() for _, source in csv_files]
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    with executor or contextlib.nullcontext():
+        chunksize = load_variant("Helpers.py")["pool_chunksize"](len(sources), workers)
+        partials = timed(stages, "parse", lambda: list(module["parse_sources"](sources, executor, chunksize)))
+
+    operator_templates = {}
+    offset = 0
+    for operator, csv_files in operator_csvs.items():
+        _, templates, _ = timed(
+            stages, "reduce", module["reduce_partials"], csv_files, partials[offset:offset + len(csv_files)]
+        )
+        offset += len(csv_files)
+        operator_templates[operator] = timed(stages, "merge_templates", module["merge_templates"], templates)
+
+    timed(stages, "merge_global_master", module["merge_global_master"], operator_templates)
+    return stages
+
+def run_pipeline_variant(corpus_dir, output_dir, parser, workers=1):
+    """Time Pipeline.run_pipeline with one parser strategy and the count and template stages."""
+    module = load_variant("Pipeline.py")
+    stages = {}
+    timed(stages, "run_pipeline", module["run_pipeline"], corpus_dir, output_dir, parser, ("count", "template"),
+          workers)
+    return stages
+
+def run_updated_cache_warm(corpus_dir, output_dir):
+    """Time a re-run of Updatedmastertemplate.py where every CSV is already cached."""
+    module = load_variant("Updatedmastertemplate.py")
+    cache_path = os.path.join(output_dir, "parse_cache.sqlite")
+    module["process_all_operators"](corpus_dir, output_dir, 1, cache_path)  # Warm-up, not timed
+
+    stages = {}
+    operator_templates, _, _ = timed(
+        stages, "process_all_operators", module["process_all_operators"], corpus_dir, output_dir, 1, cache_path
+    )
+    timed(stages, "merge_global_master", module["merge_global_master"], operator_templates)
+    return stages
+
+def run_updated_async(corpus_dir, output_dir, workers):
+    """Time Asyncpipeline.py's overlapped walk/read/parse run."""
+    module = load_variant("Asyncpipeline.py")
+    stages = {}
+    operator_templates, _, _ = timed(
+        stages, "process_all_operators_async", module["process_all_operators_async"], corpus_dir, output_dir, workers
+    )
+    timed(stages, "merge_global_master", module["umt"].merge_global_master, operator_templates)
+    return stages
+
+def run_legacy(file_name, corpus_dir, output_dir):
+    """Time process_all_operators and merge_global_master of an older script."""
+    module = load_variant(file_name)
+    stages = {}
+    if "output_dir" in module["process_all_operators"].__code__.co_varnames:
+        results = timed(stages, "process_all_operators", module["process_all_operators"], corpus_dir, output_dir)
+    else:
+        results = timed(stages, "process_all_operators", module["process_all_operators"], corpus_dir)
+    timed(stages, "merge_global_master", module["merge_global_master"], results[0])
+    return stages
+
+def run_ne(corpus_dir, output_dir):
+    """Time Ne.py's structure clustering over the whole tree."""
+    module = load_variant("Ne.py")
+    stages = {}
+    timed(stages, "process_directory", module["process_directory"], corpus_dir)
+    return stages
+
+def run_variant(variant, corpus_dir, output_dir, workers):
+    """Dispatch one variant; returns its stage timings."""
+    if variant == "updated-serial":
+        return run_updated(corpus_dir, output_dir)
+    if variant == "updated-pool":
+        return run_updated(corpus_dir, output_dir, workers)
+    if variant == "updated-cache-warm":
+        return run_updated_cache_warm(corpus_dir, output_dir)
+    if variant == "updated-async":
+        return run_updated_async(corpus_dir, output_dir, workers)
+    if variant == "pipeline-scan-pool":  # What Updatedmastertemplate.main() runs
+        return run_pipeline_variant(corpus_dir, output_dir, "scan", workers)
+    if variant.startswith("pipeline-"):
+        return run_pipeline_variant(corpus_dir, output_dir, variant[len("pipeline-"):])
+    if variant == "mastertemplate":
+        return run_legacy("Mastertemplate.py", corpus_dir, output_dir)
+    if variant == "newmastertemplate":
+        return run_legacy("NewMastertemplate", corpus_dir, output_dir)
+    if variant == "mt":
+        return run_legacy("Mt.py", corpus_dir, output_dir)
+    if variant == "ne":
+        return run_ne(corpus_dir, output_dir)
+    raise ValueError(f"Unknown variant: {variant}")
+
+def peak_rss_mb():
+    """Peak RSS of this process and its finished children, in MB."""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB elsewhere
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak * scale / (1 << 20)
+
+def variant_worker(queue, variant, corpus_dir, output_dir, workers):
+    """Child-process entry point: fresh interpreter, so imports and peak memory are per variant."""
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            stages = run_variant(variant, corpus_dir, output_dir, workers)
+        wall = sum(stages.values())  # Timed stages only: module loading and warm-up runs are excluded
+    except Exception as error:  # Report back instead of leaving the parent waiting
+        queue.put({"error": f"{type(error).__name__}: {error}"})
+        raise
+    queue.put({"wall_s": wall, "stages": stages, "peak_rss_mb": peak_rss_mb()})
+
+def measure(variant, corpus_dir, workers):
+    """Run a variant on a private copy of the corpus (older scripts extract ZIPs in place)."""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as scratch:
+        run_corpus = os.path.join(scratch, "corpus")
+        shutil.copytree(corpus_dir, run_corpus)
+        queue = context.Queue()
+        process = context.Process(
+            target=variant_worker, args=(queue, variant, run_corpus, os.path.join(scratch, "out"), workers)
+        )
+        process.start()
+        result = queue.get()
+        process.join()
+
+    if "error" in result:
+        raise RuntimeError(f"{variant} failed: {result['error']}")
+    return result
+
+def git_revision():
+    """Current commit of the repository, for labelling results."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(results, baseline_path, tolerance=0.10):
+    """Print wall-time ratios against a previous results file and flag regressions."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["variant"], r["size"]): r for r in map(json.loads, f)}
+
+    print(f"\n### Comparison with {baseline_path} ###")
+    regressions = 0
+    for record in results:
+        previous = baseline.get((record["variant"], record["size"]))
+        if previous is None:
+            continue
+        ratio = record["wall_s"] / previous["wall_s"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        regressions += bool(flag)
+        print(f"{record['variant']:20} {record['size']:8} {previous['wall_s']:8.3f}s -> {record['wall_s']:8.3f}s  x{ratio:.2f} {flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the template pipeline variants on synthetic corpora.")
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Pool size for the *-pool variants and updated-async")
+    parser.add_argument("--sections", type=int, default=8)
+    parser.add_argument("--params", type=int, default=20)
+    parser.add_argument("--overlap", type=float, default=0.7)
+    parser.add_argument("--value-rows", type=int, default=5)
+    parser.add_argument("--zip-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.jsonl", help="JSON lines file results are appended to")
+    parser.add_argument("--compare", help="Previous results file to compare wall times against")
+    parser.add_argument("--verify", action="store_true",
+                        help="Only check fast cell normalization against csv.reader + clean_text, the line "
+                             "scanner against parse_csv_partial, every pipeline parser against the code it "
+                             "replaces and merged multi-process shards against one run")
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        mismatches = 0
+        for size in args.sizes.split(","):
+            with tempfile.TemporaryDirectory() as corpus_dir:
+                generate_corpus(corpus_dir, *SIZES[size], args.sections, args.params, args.overlap,
+                                args.value_rows, args.zip_ratio, seed=args.seed)
+                mismatches += verify_normalization(corpus_dir)
+                mismatches += verify_scan(corpus_dir)
+                mismatches += verify_pipeline(corpus_dir)
+                mismatches += verify_shards(corpus_dir)
+        return 1 if mismatches else 0
+
+    results = []
+    revision = git_revision()
+
+    for size in args.sizes.split(","):
+        operators, files = SIZES[size]
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            stats = generate_corpus(
+                corpus_dir, operators, files, args.sections, args.params, args.overlap,
+                args.value_rows, args.zip_ratio, seed=args.seed,
+            )
+            print(f"\n### {size}: {stats['operators']} operators, {stats['files']} CSVs, {stats['bytes'] / 1e6:.1f} MB ###")
+
+            for variant in args.variants.split(","):
+                measured = measure(variant, corpus_dir, args.workers)
+                if variant in ZIP_AWARE_VARIANTS:
+                    parsed_files, parsed_bytes = stats["files"], stats["bytes"]
+                else:
+                    parsed_files, parsed_bytes = stats["loose_files"], stats["loose_bytes"]
+                record = {
+                    "timestamp": time.time(), "revision": revision, "variant": variant, "size": size,
+                    **stats, **measured,
+                    "parsed_files": parsed_files,
+                    "files_per_s": parsed_files / measured["wall_s"],
+                    "mb_per_s": parsed_bytes / 1e6 / measured["wall_s"],
+                }
+                results.append(record)
+
+                stages = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in record["stages"].items())
+                print(f"{variant:20} {record['wall_s']:8.3f}s {record['files_per_s']:9.1f} files/s "
+                      f"{record['mb_per_s']:7.2f} MB/s  peak {record['peak_rss_mb'] or 0:7.1f} MB  [{stages}]")
+
+    with open(args.output, "a", encoding="utf-8") as f:
+        for record in results:
+            f.write(json.dumps(record) + "\n")
+    print(f"\nResults appended to {args.output}")
+
+    if args.compare:
+        return 1 if compare_results(results, args.compare) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import collections
+import collections.abc
+from array import array
+
+PARAM_ID_TYPE = "I"  # 32-bit unsigned parameter/section IDs
+
+class SymbolTable:
+    """Interned section and parameter names mapped to dense integer IDs."""
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def encode(self, names):
+        """Sorted ID array for a collection of names."""
+        return array(PARAM_ID_TYPE, sorted({self.intern(name) for name in names}))
+
+    def decode(self, ids):
+        return [self.names[symbol] for symbol in ids]
+
+class CompactTemplates(collections.abc.Mapping):
+    """One operator's templates: section ID -> sorted parameter ID array, in first-seen order.
+
+    Behaves like the {section: sorted parameter names} dict of merge_templates
+    (names are decoded on access). While an operator is reduced, add() collects
+    ID sets; freeze() turns them into arrays.
+    """
+    __slots__ = ("symbols", "sections")
+
+    def __init__(self, symbols, sections=None):
+        self.symbols = symbols
+        self.sections = {} if sections is None else sections
+
+    def add(self, section, names):
+        """Union one CSV's parameters into a section."""
+        ids = self.sections.setdefault(self.symbols.intern(section), set())
+        ids.update(self.symbols.intern(name) for name in names)
+
+    def freeze(self):
+        """Store every section's parameter IDs as a sorted array."""
+        self.sections = {section: array(PARAM_ID_TYPE, sorted(ids)) for section, ids in self.sections.items()}
+
+    def __getitem__(self, section):
+        section_id = self.symbols.ids.get(section)
+        if section_id not in self.sections:
+            raise KeyError(section)
+        return sorted(self.symbols.decode(self.sections[section_id]))
+
+    def __iter__(self):
+        return iter(self.symbols.decode(self.sections))
+
+    def __len__(self):
+        return len(self.sections)
+
+class CompactParamSets(collections.abc.Mapping):
+    """Per-CSV parameter sets stored as sorted ID arrays.
+
+    Behaves like the {file: set(parameters)} dict the analyses expect (sets are
+    decoded on access); encode() builds the analysis matrix straight from the IDs.
+    """
+    __slots__ = ("symbols", "positions", "files", "params")
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.positions = {}
+        self.files = []
+        self.params = []
+
+    def add(self, file, ids):
+        """Store a CSV's parameter IDs; a repeated file name replaces the earlier entry, as with a dict."""
+        position = self.positions.get(file)
+        if position is None:
+            self.positions[file] = len(self.files)
+            self.files.append(file)
+            self.params.append(ids)
+        else:
+            self.params[position] = ids
+
+    def __getitem__(self, file):
+        return set(self.symbols.decode(self.params[self.positions[file]]))
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+    def encode(self):
+        """Boolean CSV x parameter matrix and its column vocabulary, like encode_param_sets."""
+        import numpy as np
+
+        lengths = [len(ids) for ids in self.params]
+        flat = np.concatenate([np.frombuffer(ids, dtype=np.uint32) for ids in self.params]) if self.params else \
+            np.zeros(0, dtype=np.uint32)
+        columns, inverse = np.unique(flat, return_inverse=True)
+
+        matrix = np.zeros((len(self.params), len(columns)), dtype=bool)
+        matrix[np.repeat(np.arange(len(self.params)), lengths), inverse] = True
+        return matrix, np.array(self.symbols.decode(columns.tolist()), dtype=object)
+
+def param_set_memory(operator_param_sets):
+    """Return (compact_bytes, dict_of_sets_bytes) for per-CSV parameter storage, measured with tracemalloc.
+
+    Each operator's parameter sets are rebuilt once as CompactParamSets and once as
+    {file: set(names)} while tracing, and the bytes each copy keeps allocated are
+    summed; only one operator's copy exists at a time. Name strings are shared by
+    both layouts and not counted; the symbol table the compact layout needs is.
+    """
+    import tracemalloc
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    def retained(build):
+        before = tracemalloc.get_traced_memory()[0]
+        copy = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+        del copy
+        return size
+
+    compact = legacy = 0
+    symbols = None
+    try:
+        for param_sets in operator_param_sets.values():
+            if not isinstance(param_sets, CompactParamSets):
+                continue
+            symbols = param_sets.symbols
+
+            def build_compact():
+                copy = CompactParamSets(symbols)
+                for file, ids in zip(param_sets.files, param_sets.params):
+                    copy.add(file, array(PARAM_ID_TYPE, ids))
+                return copy
+
+            compact += retained(build_compact)
+            legacy += retained(lambda: {
+                file: set(symbols.decode(ids)) for file, ids in zip(param_sets.files, param_sets.params)
+            })
+
+        if symbols is not None:
+            compact += retained(lambda: (dict(symbols.ids), list(symbols.names)))
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    return compact, legacy
@@ -0,0 +1,96 @@
+import os
+import collections
+import functools
+import itertools
+
+# Small helpers shared by the template scripts. numpy, matplotlib and seaborn are imported
+# on first use so template-only runs that import this module still start fast.
+
+def load_plotting(headless=False):
+    """Import the plotting stack on first use; headless selects the non-interactive Agg backend."""
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+def finish_figure(plt, figure_dir, name):
+    """Save the current figure as figure_dir/name.png, or show it when figure_dir is None."""
+    if figure_dir is None:
+        plt.show()
+        return
+
+    os.makedirs(figure_dir, exist_ok=True)
+    file_path = os.path.join(figure_dir, f"{name}.png")
+    plt.savefig(file_path, bbox_inches="tight")
+    plt.close()
+    print(f"Figure saved: {file_path}")
+
+def pool_chunksize(tasks, workers):
+    """CSVs per process pool task: about four tasks per worker, at most 64 CSVs each."""
+    return max(1, min(64, tasks // (workers * 4)))  # Amortize IPC per task
+
+def map_chunk(func, chunk):
+    """Apply func to every item of one submitted chunk; runs in a worker process."""
+    return [func(item) for item in chunk]
+
+def bounded_map(executor, func, items, chunksize=1, window=8):
+    """executor.map that submits lazily, keeping at most window chunks in flight.
+
+    executor.map submits every chunk up front and holds all finished results until
+    they are consumed; here a new chunk is only submitted when the oldest one is
+    collected, so memory stays bounded however far the consumer lags. Results come
+    back in input order.
+    """
+    items = iter(items)
+    task = functools.partial(map_chunk, func)
+    pending = collections.deque()
+
+    def submit():
+        chunk = list(itertools.islice(items, chunksize))
+        if chunk:
+            pending.append(executor.submit(task, chunk))
+        return bool(chunk)
+
+    for _ in range(window):
+        if not submit():
+            break
+
+    while pending:
+        results = pending.popleft().result()
+        submit()
+        yield from results
+
+def encode_param_sets(param_sets):
+    """Intern parameters to integer IDs and encode each set as a row of a boolean matrix."""
+    import numpy as np
+
+    vocabulary = {}
+    rows, cols = [], []
+
+    for row, params in enumerate(param_sets):
+        for param in params:
+            cols.append(vocabulary.setdefault(param, len(vocabulary)))
+            rows.append(row)
+
+    matrix = np.zeros((len(param_sets), len(vocabulary)), dtype=bool)
+    matrix[rows, cols] = True
+    return matrix, np.array(list(vocabulary), dtype=object)
+
+def param_set_matrix(csv_param_sets):
+    """encode_param_sets for one operator's {csv: parameters}, plain dict or Compactstore.CompactParamSets."""
+    if hasattr(csv_param_sets, "encode"):  # CompactParamSets encodes its ID arrays directly
+        return csv_param_sets.encode()
+    return encode_param_sets(list(csv_param_sets.values()))
+
+def wrapping_multiply(a, b):
+    """Elementwise uint64 product modulo 2**64.
+
+    Multiply-shift and universal hashing rely on the wrap-around, so overflow
+    is expected here rather than an error.
+    """
+    import numpy as np
+
+    with np.errstate(over="ignore"):
+        return np.multiply(a, b, dtype=np.uint64)
@@ -2,9 +2,9 @@ import os
 import zipfile
 import csv
 import collections
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+from Helpers import load_plotting, finish_figure
+
+# pandas, seaborn and matplotlib are imported on first use so template-only runs start fast.
 
 def extract_zip(zip_path, extract_to):
     """Extract ZIP file to a directory."""
@@ -134,8 +134,11 @@ def save_global_master_template(global_template, output_dir):
 
     print(f"Global master template saved: {file_path}")
 
-def display_results(operator_templates, operator_counts):
+def display_results(operator_templates, operator_counts, figure_dir=None):
     """Display results in tabular form using pandas."""
+    import pandas as pd
+    plt, sns = load_plotting(headless=figure_dir is not None)
+
     print("\n### Operator-wise Analysis ###")
     all_data = []
 
@@ -162,15 +165,18 @@ def display_results(operator_templates, operator_counts):
     plt.xlabel("Operator")
     plt.ylabel("Count")
     plt.legend(title="Section Type")
-    plt.show()
+    finish_figure(plt, figure_dir, "section_distribution")
 
 def main():
     base_directory = "path/to/your/directory"  # Change this to your actual directory
     output_dir = "path/to/output/directory"  # Change this to where you want TXT files saved
+    reports = True  # Set False for a template-only run that never imports pandas/matplotlib
+    figure_dir = os.path.join(output_dir, "figures")  # Set to None to show figures interactively
 
     operator_templates, operator_counts = process_all_operators(base_directory, output_dir)
 
-    display_results(operator_templates, operator_counts)
+    if reports:
+        display_results(operator_templates, operator_counts, figure_dir)
 
     global_master_template = merge_global_master(operator_templates)
     save_global_master_template(global_master_template, output_dir)
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import heapq
+import cProfile
+import contextlib
+
+COUNTERS = ("operators", "files", "cached_files", "bytes", "rows", "cells", "sections", "parameters")
+
+def new_metrics(slowest_n=10):
+    """Create an empty metrics collector; pass None instead to disable instrumentation."""
+    return {
+        "stages": {},
+        "counters": dict.fromkeys(COUNTERS, 0),
+        "operators": {},
+        "slowest_files": [],  # Min-heap of (seconds, operator, file), at most slowest_n long
+        "slowest_n": slowest_n,
+    }
+
+@contextlib.contextmanager
+def stage(metrics, name):
+    """Accumulate the wall time of a block under metrics["stages"][name]; no-op when metrics is None."""
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics["stages"][name] = metrics["stages"].get(name, 0.0) + time.perf_counter() - start
+
+def operator_entry(metrics, operator):
+    """Per-operator totals, created on first use."""
+    if operator not in metrics["operators"]:
+        metrics["operators"][operator] = {"files": 0, "bytes": 0, "parse_seconds": 0.0, "reduce_seconds": 0.0}
+        metrics["counters"]["operators"] += 1
+    return metrics["operators"][operator]
+
+def record_file(metrics, operator, file, stats):
+    """Add one parsed file's stats (seconds, bytes, rows, cells, sections, parameters)."""
+    counters = metrics["counters"]
+    counters["files"] += 1
+    for name in ("bytes", "rows", "cells", "sections", "parameters"):
+        counters[name] += stats[name]
+
+    entry = operator_entry(metrics, operator)
+    entry["files"] += 1
+    entry["bytes"] += stats["bytes"]
+    entry["parse_seconds"] += stats["seconds"]
+
+    slowest = metrics["slowest_files"]
+    item = (stats["seconds"], operator, file)
+    if len(slowest) < metrics["slowest_n"]:
+        heapq.heappush(slowest, item)
+    elif item > slowest[0]:
+        heapq.heapreplace(slowest, item)
+
+def record_cached_file(metrics, operator):
+    """Count a file whose partial came from the parse cache."""
+    metrics["counters"]["cached_files"] += 1
+    operator_entry(metrics, operator)["files"] += 1
+
+def record_reduce(metrics, operator, seconds):
+    """Add time spent folding an operator's partials into its templates."""
+    operator_entry(metrics, operator)["reduce_seconds"] += seconds
+
+def metrics_report(metrics):
+    """Return a JSON-serialisable summary with throughput and slowest-N rankings."""
+    counters = metrics["counters"]
+    parse_seconds = metrics["stages"].get("parse", 0.0)
+    operators = metrics["operators"]
+    slowest_operators = sorted(
+        operators, key=lambda o: operators[o]["parse_seconds"] + operators[o]["reduce_seconds"], reverse=True
+    )[:metrics["slowest_n"]]
+
+    return {
+        "stages": metrics["stages"],
+        "counters": counters,
+        "throughput": {
+            "files_per_s": counters["files"] / parse_seconds if parse_seconds else None,
+            "mb_per_s": counters["bytes"] / 1e6 / parse_seconds if parse_seconds else None,
+        },
+        "operators": operators,
+        "slowest_operators": [{"operator": o, **operators[o]} for o in slowest_operators],
+        "slowest_files": [
+            {"operator": operator, "file": file, "seconds": seconds}
+            for seconds, operator, file in sorted(metrics["slowest_files"], reverse=True)
+        ],
+    }
+
+def save_metrics(metrics, file_path):
+    """Write the metrics report as JSON."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(metrics_report(metrics), f, indent=2)
+
+    print(f"Metrics saved: {file_path}")
+
+@contextlib.contextmanager
+def profiled(profile_path):
+    """Run a block under cProfile and dump pstats to profile_path; no-op when profile_path is None.
+
+    Only the calling process is profiled, so run with workers=1 to see parse_csv internals.
+    """
+    if profile_path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        print(f"Profile saved: {profile_path} (inspect with python -m pstats)")
@@ -0,0 +1,185 @@
+import collections
+import hashlib
+import numpy as np
+from Helpers import wrapping_multiply
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+def hash_token(token):
+    """Stable 32-bit hash of a string token (identical across processes and runs)."""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+def minhash_signatures(token_sets, num_perm=128, seed=1):
+    """Compute a MinHash signature matrix with one row of num_perm hashes per token set."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    token_hashes = {}  # Parameter names repeat heavily across files
+    signatures = np.full((len(token_sets), num_perm), MAX_HASH, dtype=np.uint64)
+
+    for row, tokens in enumerate(token_sets):
+        if not tokens:
+            continue
+
+        hashes = np.fromiter(
+            (token_hashes[t] if t in token_hashes else token_hashes.setdefault(t, hash_token(t)) for t in tokens),
+            dtype=np.uint64, count=len(tokens),
+        )
+        permuted = ((wrapping_multiply(hashes[:, None], a) + b) % MERSENNE_PRIME) & MAX_HASH
+        signatures[row] = permuted.min(axis=0)
+
+    return signatures
+
+def choose_bands(num_perm, threshold):
+    """Pick (bands, rows) whose LSH S-curve threshold (1/b)**(1/r) is the highest not above threshold."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) > threshold:
+            break
+        best = (bands, rows)
+    return best
+
+def build_similarity_index(token_sets, threshold=0.8, num_perm=128, seed=1):
+    """Build a MinHash LSH index over token sets; accuracy grows with num_perm."""
+    signatures = minhash_signatures(token_sets, num_perm, seed)
+    bands, rows = choose_bands(num_perm, threshold)
+    buckets = [collections.defaultdict(list) for _ in range(bands)]
+
+    for item, signature in enumerate(signatures):
+        for band in range(bands):
+            buckets[band][signature[band * rows:(band + 1) * rows].tobytes()].append(item)
+
+    return {"signatures": signatures, "threshold": threshold, "bands": bands, "rows": rows, "buckets": buckets}
+
+def estimate_jaccard(index, i, j):
+    """Estimated Jaccard similarity of two indexed sets."""
+    signatures = index["signatures"]
+    return float(np.mean(signatures[i] == signatures[j]))
+
+def query_near_duplicates(index, item, threshold=None):
+    """Return [(other_item, estimated_jaccard)] for sets near item, most similar first."""
+    threshold = index["threshold"] if threshold is None else threshold
+    rows = index["rows"]
+    signature = index["signatures"][item]
+
+    candidates = set()
+    for band, buckets in enumerate(index["buckets"]):
+        candidates.update(buckets.get(signature[band * rows:(band + 1) * rows].tobytes(), ()))
+    candidates.discard(item)
+
+    matches = [(other, estimate_jaccard(index, item, other)) for other in candidates]
+    return sorted([m for m in matches if m[1] >= threshold], key=lambda m: (-m[1], m[0]))
+
+def candidate_pairs(index):
+    """Yield (i, j) pairs sharing an LSH bucket whose estimated Jaccard passes the threshold.
+
+    Each bucket member is checked against the bucket's first member and its predecessor,
+    which keeps the work linear in bucket size while chaining families together.
+    """
+    seen = set()
+    for buckets in index["buckets"]:
+        for members in buckets.values():
+            for position in range(1, len(members)):
+                for other in {members[0], members[position - 1]}:
+                    pair = (other, members[position])
+                    if pair in seen:
+                        continue
+                    seen.add(pair)
+                    if estimate_jaccard(index, *pair) >= index["threshold"]:
+                        yield pair
+
+def union_families(size, pairs):
+    """Connected components (sorted, largest first) of size items joined by pairs."""
+    parent = list(range(size))
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    families = collections.defaultdict(list)
+    for item in range(size):
+        families[find(item)].append(item)
+
+    return sorted(families.values(), key=lambda family: (-len(family), family[0]))
+
+def cluster_families(index):
+    """Group indexed sets into families connected by estimated Jaccard >= threshold."""
+    return union_families(len(index["signatures"]), candidate_pairs(index))
+
+def exact_jaccard_matrix(token_sets):
+    """Exact pairwise Jaccard similarities via a boolean incidence matrix product."""
+    vocabulary = {}
+    rows, cols = [], []
+    for row, tokens in enumerate(token_sets):
+        for token in tokens:
+            cols.append(vocabulary.setdefault(token, len(vocabulary)))
+            rows.append(row)
+
+    matrix = np.zeros((len(token_sets), len(vocabulary)), dtype=np.float32)
+    matrix[rows, cols] = 1
+    intersections = matrix @ matrix.T
+    sizes = matrix.sum(axis=1)
+    unions = sizes[:, None] + sizes[None, :] - intersections
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(unions > 0, intersections / unions, 1.0)
+
+def co_member_pairs(families):
+    """All (i, j) pairs, i < j, that share a family."""
+    return {(i, j) for family in families for i in family for j in family if i < j}
+
+def precision_recall(approx, exact):
+    """Precision and recall of an approximate pair set against the exact one."""
+    hits = len(approx & exact)
+    return (hits / len(approx) if approx else 1.0), (hits / len(exact) if exact else 1.0)
+
+def evaluate_against_exact(token_sets, threshold=0.8, num_perm=128, seed=1, sample_size=2000):
+    """Report near-duplicate and family accuracy of the LSH index against exact Jaccard on a sample."""
+    rng = np.random.default_rng(seed)
+    sample = np.arange(len(token_sets))
+    if len(sample) > sample_size:
+        sample = np.sort(rng.choice(sample, size=sample_size, replace=False))
+
+    sample_sets = [token_sets[i] for i in sample]
+    index = build_similarity_index(sample_sets, threshold, num_perm, seed)
+    exact = exact_jaccard_matrix(sample_sets)
+
+    exact_pairs = set(zip(*(axis.tolist() for axis in np.nonzero(np.triu(exact >= threshold, k=1)))))
+    approx_pairs = {
+        (min(item, other), max(item, other))
+        for item in range(len(sample_sets))
+        for other, _ in query_near_duplicates(index, item)
+    }
+    pair_precision, pair_recall = precision_recall(approx_pairs, exact_pairs)
+
+    exact_families = union_families(len(sample_sets), exact_pairs)
+    approx_families = cluster_families(index)
+    family_precision, family_recall = precision_recall(
+        co_member_pairs(approx_families), co_member_pairs(exact_families)
+    )
+
+    errors = [abs(estimate_jaccard(index, i, j) - exact[i, j]) for i, j in approx_pairs | exact_pairs]
+
+    return {
+        "sampled_sets": len(sample_sets),
+        "num_perm": num_perm,
+        "bands": index["bands"],
+        "rows": index["rows"],
+        "pair_precision": pair_precision,
+        "pair_recall": pair_recall,
+        "exact_families": len(exact_families),
+        "approx_families": len(approx_families),
+        "family_precision": family_precision,
+        "family_recall": family_recall,
+        "mean_abs_error": float(np.mean(errors)) if errors else 0.0,
+    }
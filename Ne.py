@@ -2,6 +2,7 @@ import os
 import zipfile
 import csv
 import collections
+import Minhash
 
 def extract_zip(zip_path, extract_to):
     """Extract ZIP file to a directory."""
@@ -54,8 +55,36 @@ def process_directory(directory):
 
     return section_counts, templates
 
+def cluster_template_families(templates, threshold=0.8, num_perm=128):
+    """Merge exact section structures into families whose section sets have Jaccard >= threshold."""
+    structures = list(templates.keys())
+    index = Minhash.build_similarity_index([set(structure) for structure in structures], threshold, num_perm)
+
+    families = []
+    for family in Minhash.cluster_families(index):
+        members = [structures[i] for i in family]
+        files = [file_path for structure in members for file_path in templates[structure]]
+        families.append((members, files))
+
+    return families
+
+def find_structural_duplicates(templates, file_path, threshold=0.8, num_perm=128):
+    """List files whose section structure is near-identical (Jaccard >= threshold) to file_path's."""
+    structures = list(templates.keys())
+    target = next((i for i, structure in enumerate(structures) if file_path in templates[structure]), None)
+    if target is None:
+        raise KeyError(f"{file_path} is not in any template structure")
+    index = Minhash.build_similarity_index([set(structure) for structure in structures], threshold, num_perm)
+
+    matches = [f for f in templates[structures[target]] if f != file_path]  # Exact structure matches
+    for other, _ in Minhash.query_near_duplicates(index, target):
+        matches.extend(templates[structures[other]])
+
+    return matches
+
 def main():
     directory = "path/to/your/directory"  # Change this to your actual directory
+    similarity_threshold = None  # e.g. 0.8 to also group near-identical structures with MinHash LSH
     section_counts, templates = process_directory(directory)
 
     print("Section Type Counts:")
@@ -67,5 +96,12 @@ def main():
         print(f"\nMaster Template {i}: {template}")
         print(f"  {len(files)} files match this structure.")
 
+    if similarity_threshold is not None:
+        families = cluster_template_families(templates, similarity_threshold)
+        print(f"\nTemplate Families (Jaccard >= {similarity_threshold}): {len(families)}")
+        for i, (structures, files) in enumerate(families, 1):
+            print(f"\nFamily {i}: {len(structures)} structures, {len(files)} files")
+            print(f"  Representative: {structures[0]}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,131 @@
+import os
+import sys
+import argparse
+import sqlite3
+
+def open_index_writer(index_path):
+    """Start building an index next to index_path; feed it with add_operator_postings."""
+    tmp_path = index_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    index = sqlite3.connect(tmp_path)
+    index.execute("CREATE TABLE symbols (id INTEGER PRIMARY KEY, name TEXT)")
+    index.execute(
+        "CREATE TABLE postings (parameter INTEGER, section INTEGER, operator INTEGER, file INTEGER, "
+        "PRIMARY KEY (parameter, section, operator, file)) WITHOUT ROWID"
+    )
+    return {"index": index, "symbols": {}, "index_path": index_path, "tmp_path": tmp_path}
+
+def add_operator_postings(writer, operator, csv_files, partials):
+    """Add one operator's per-CSV partials, so they can be released right afterwards.
+
+    csv_files pairs each partial with a (name, source); names must be unique within
+    the operator (e.g. Updatedmastertemplate.source_name), or CSVs sharing a name
+    collapse into one posting.
+    """
+    symbols = writer["symbols"]
+
+    def intern(name):
+        if name not in symbols:
+            symbols[name] = len(symbols)
+        return symbols[name]
+
+    operator_id = intern(operator)
+    postings = set()
+
+    for (file, _), (_, section_params) in zip(csv_files, partials):
+        file_id = intern(file)
+        for section, params in section_params.items():
+            section_id = intern(section)
+            postings.update((intern(param), section_id, operator_id, file_id) for param in params)
+
+    writer["index"].executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)", postings)
+
+def close_index_writer(writer):
+    """Write the symbol table and atomically swap the finished index into place."""
+    index = writer["index"]
+    index.executemany("INSERT INTO symbols VALUES (?, ?)", ((i, name) for name, i in writer["symbols"].items()))
+    index.execute("CREATE UNIQUE INDEX symbols_name ON symbols (name)")
+    index.commit()
+    index.execute("VACUUM")
+    index.close()
+
+    os.replace(writer["tmp_path"], writer["index_path"])
+    print(f"Parameter index saved: {writer['index_path']}")
+
+def open_param_index(index_path):
+    """Open a saved index read-only and memory-mapped."""
+    index = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    index.execute("PRAGMA mmap_size = 1073741824")
+    return index
+
+def _narrow(parameter, section, operator):
+    """Build the WHERE clause shared by the query functions."""
+    where = ["postings.parameter = (SELECT id FROM symbols WHERE name = ?)"]
+    args = [parameter]
+    for column, name in (("section", section), ("operator", operator)):
+        if name is not None:
+            where.append(f"postings.{column} = (SELECT id FROM symbols WHERE name = ?)")
+            args.append(name)
+    return " AND ".join(where), args
+
+def query_parameter(index, parameter, section=None, operator=None):
+    """Return {section: {operator: [files]}} for a parameter, optionally narrowed."""
+    where, args = _narrow(parameter, section, operator)
+    rows = index.execute(
+        "SELECT s.name, o.name, f.name FROM postings "
+        "JOIN symbols s ON s.id = postings.section "
+        "JOIN symbols o ON o.id = postings.operator "
+        "JOIN symbols f ON f.id = postings.file "
+        f"WHERE {where} ORDER BY s.name, o.name, f.name",
+        args,
+    )
+
+    result = {}
+    for section_name, operator_name, file in rows:
+        result.setdefault(section_name, {}).setdefault(operator_name, []).append(file)
+    return result
+
+def count_parameter(index, parameter, section=None, operator=None):
+    """Return {section: {operator: file_count}} for a parameter without listing files."""
+    where, args = _narrow(parameter, section, operator)
+    rows = index.execute(
+        "SELECT s.name, o.name, COUNT(*) FROM postings "
+        "JOIN symbols s ON s.id = postings.section "
+        "JOIN symbols o ON o.id = postings.operator "
+        f"WHERE {where} GROUP BY postings.section, postings.operator ORDER BY s.name, o.name",
+        args,
+    )
+
+    result = {}
+    for section_name, operator_name, count in rows:
+        result.setdefault(section_name, {})[operator_name] = count
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up which sections, operators and files use a parameter.")
+    parser.add_argument("index_path", help="Index written by process_all_operators(index_path=...)")
+    parser.add_argument("parameter")
+    parser.add_argument("--section", help="Only this section, e.g. @CELL")
+    parser.add_argument("--operator", help="Only this operator")
+    parser.add_argument("--counts", action="store_true", help="Print file counts instead of file lists")
+    args = parser.parse_args(argv)
+
+    index = open_param_index(args.index_path)
+    if args.counts:
+        for section, operators in count_parameter(index, args.parameter, args.section, args.operator).items():
+            print(section)
+            for operator, count in operators.items():
+                print(f"  {operator}: {count} files")
+    else:
+        for section, operators in query_parameter(index, args.parameter, args.section, args.operator).items():
+            print(section)
+            for operator, files in operators.items():
+                print(f"  {operator}: {len(files)} files")
+                for file in files:
+                    print(f"    {file}")
+    index.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
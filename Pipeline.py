@@ -0,0 +1,565 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import functools
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import Helpers
+import Metrics
+import Paramindex
+import Updatedmastertemplate as umt
+
+# One engine for the parse_csv / process_operator variants of Mastertemplate.py, Mt.py, Ne.py,
+# NewMastertemplate and Updatedmastertemplate.py; Updatedmastertemplate.process_all_operators
+# and main() run on it. The engine walks the operators (keeping a shard's share), deduplicates,
+# serves unchanged CSVs from the parse cache and parses the rest a bounded window ahead with a
+# pluggable parser strategy. Every CSV becomes one partial (first_section, {section: parameters})
+# that each selected stage folds into its own per-operator state. A stage is a dict of
+# optional functions:
+#   "start"(context)                         -> before parsing, e.g. whole-corpus exports
+#   "new"(context)                           -> empty per-operator state
+#   "add"(state, file, source, partial)      -> fold one CSV in
+#   "operator"(state, operator, context)     -> per-operator result (default: the state)
+#   "finish"({operator: result}, context)    -> stage result, stored in context["results"][name]
+# plus "requires", the stages whose results it reads. Stages run in the order given, so a stage
+# can use the results of those before it. Empty CSVs are skipped by every stage.
+# Partials hold no values, so stages that read value rows (export, value_stats) tap the parser's
+# event stream instead, in the worker that reads the CSV:
+#   "open"(operator, settings)               -> per-operator sink, in the worker
+#   "tap"(sink, file, source, events)        -> the events, passed through while the sink reads them
+#   "close"(sink)                            -> per-operator result, sent back to "finish"
+# With a tapping stage selected, each operator's CSVs are read once in one task that yields the
+# partials and feeds every tap, so the parse cache and dedup no longer save reading a CSV.
+
+def iter_lookahead_events(source):
+    """Stream (kind, section, row) events with Mt.py / Ne.py semantics.
+
+    The row right after a section header is its parameter line and the one after
+    that its first value row, whatever they contain (an empty row gives an empty
+    parameter line). Rows before the first header are ignored. As in Mt.py only
+    the header cell is stripped; parameters keep their raw csv.reader text.
+    """
+    current_section = None
+
+    with umt.open_csv_source(source) as f:
+        reader = csv.reader(f)
+        for row in reader:
+            if not row:
+                continue  # Skip empty rows
+
+            first_cell = row[0].strip()
+            if first_cell.startswith("@"):  # Section name
+                current_section = first_cell
+                yield "parameters", current_section, [sys.intern(param) for param in next(reader, [])]
+                yield "values", current_section, next(reader, [])
+            elif current_section:  # Handle multi-line values
+                yield "values", current_section, row
+
+def lookahead_partial(source):
+    """parse_csv_partial with the next(reader) lookahead parsing of Mt.py and Ne.py."""
+    return umt.build_partial(iter_lookahead_events(source))
+
+PARSERS = {
+    "sections": umt.parse_csv_partial,  # parameter_mode state machine with clean_text cells
+    "scan": umt.scan_csv_partial,  # Same result, memory-mapped and skipping value rows
+    "lookahead": lookahead_partial,  # next(reader) lookahead with raw cells (Mt.py; Ne.py keeps only
+                                     # the last parameter line of a repeated section, this unions them)
+}
+
+PARSER_EVENTS = {  # Event streams the taps read; scan skips value rows, so it reads them as sections does
+    "sections": umt.iter_csv_events,
+    "scan": umt.iter_csv_events,
+    "lookahead": iter_lookahead_events,
+}
+
+def keep_state(state, operator, context):
+    return state
+
+def new_count(context):
+    return {}
+
+def add_count(state, file, source, partial):
+    first_section = partial[0]
+    state[first_section] = state.get(first_section, 0) + 1  # Count occurrences of section types
+
+def new_template(context):
+    if context["compact"]:
+        import Compactstore
+        return Compactstore.CompactTemplates(context["symbols"])
+    return {}
+
+def add_template(state, file, source, partial):
+    for section, params in partial[1].items():
+        if isinstance(state, dict):
+            state.setdefault(section, set()).update(params)
+        else:
+            state.add(section, params)
+
+def operator_template(state, operator, context):
+    if isinstance(state, dict):
+        template = {section: sorted(params) for section, params in state.items()}
+    else:
+        state.freeze()
+        template = state
+    if context["shard"] is None:  # A shard's templates are partial until merged by Shards.py
+        umt.save_master_template(operator, template, context["output_dir"])
+    return template
+
+def finish_template(operator_templates, context):
+    global_template = umt.merge_global_master(operator_templates)
+    if context["shard"] is None:
+        umt.save_global_master_template(global_template, context["output_dir"])
+    return {"operators": operator_templates, "global": global_template}
+
+def new_param_sets(context):
+    if context["compact"]:
+        import Compactstore
+        return Compactstore.CompactParamSets(context["symbols"])
+    return {}
+
+def add_param_sets(state, file, source, partial):
+    params = set().union(*partial[1].values())  # Store params per CSV
+    if isinstance(state, dict):
+        state[file] = params
+    else:
+        state.add(file, state.symbols.encode(params))
+
+def finish_param_sets(operator_param_sets, context):
+    if context["compact"]:
+        import Compactstore
+        compact_bytes, set_bytes = Compactstore.param_set_memory(operator_param_sets)
+        print(f"Per-CSV parameter sets: {compact_bytes / 1e6:.1f} MB compact vs "
+              f"{set_bytes / 1e6:.1f} MB as sets of strings (tracemalloc)")
+    return operator_param_sets
+
+def new_structure(context):
+    return {}
+
+def add_structure(state, file, source, partial):
+    structure = tuple(partial[1])  # Sections in file order
+    state.setdefault(structure, []).append(umt.source_cache_key(source)[0])
+
+def finish_structure(operator_structures, context):
+    """Group CSVs of all operators by exact section structure, optionally into MinHash families."""
+    templates = {}
+    for structures in operator_structures.values():
+        for structure, files in structures.items():
+            templates.setdefault(structure, []).extend(files)
+
+    print(f"\nUnique Templates Found: {len(templates)}")
+    for i, (template, files) in enumerate(templates.items(), 1):
+        print(f"\nMaster Template {i}: {template}")
+        print(f"  {len(files)} files match this structure.")
+
+    threshold = context["structure_threshold"]
+    families = None
+    if threshold is not None and templates:
+        import Ne
+        families = Ne.cluster_template_families(templates, threshold)
+        print(f"\nTemplate Families (Jaccard >= {threshold}): {len(families)}")
+        for i, (structures, files) in enumerate(families, 1):
+            print(f"\nFamily {i}: {len(structures)} structures, {len(files)} files")
+            print(f"  Representative: {structures[0]}")
+
+    return {"templates": templates, "families": families}
+
+def start_index(context):
+    context["index_writer"] = Paramindex.open_index_writer(context["index_path"])
+
+def new_postings(context):
+    return []
+
+def add_postings(state, file, source, partial):
+    state.append((file, source, partial))
+
+def operator_postings(state, operator, context):
+    csv_files = [(file, source) for file, source, _ in state]  # file is already the path within the operator
+    Paramindex.add_operator_postings(context["index_writer"], operator, csv_files, [partial for *_, partial in state])
+
+def finish_index(operator_results, context):
+    Paramindex.close_index_writer(context["index_writer"])
+    return context["index_path"]
+
+def start_prevalence(context):
+    import Prevalence
+    context["prevalence"] = Prevalence.new_counter(context["prevalence_sketch"])
+
+def new_prevalence(context):
+    import Prevalence
+    return Prevalence.new_counter(context["prevalence_sketch"])
+
+def add_prevalence(state, file, source, partial):
+    import Prevalence
+    Prevalence.add_partial(state, partial)
+
+def operator_prevalence(state, operator, context):
+    import Prevalence
+    Prevalence.merge_counter(context["prevalence"], state)
+    return Prevalence.save_prevalence(
+        state, operator, context["output_dir"], context["near_common_threshold"], context["top_k"]
+    )
+
+def finish_prevalence(operator_templates, context):
+    import Prevalence
+    return Prevalence.save_prevalence(
+        context["prevalence"], "global", context["output_dir"], context["near_common_threshold"], context["top_k"]
+    )
+
+def start_export(context):
+    try:
+        import pyarrow  # Fail before the pool starts, not inside every worker
+    except ImportError:
+        raise ImportError("pyarrow is required for the columnar export") from None
+
+def open_export(operator, settings):
+    operator_path = os.path.join(settings["base_directory"], operator)
+    return umt.open_columnar_export(operator, operator_path, settings["export_dir"])
+
+def tap_export(export, file, source, events):
+    return umt.export_events(export, source, events)
+
+def finish_export(operator_paths, context):
+    """Hive-partitioned Parquet dataset; query it with pyarrow.dataset using partitioning="hive"."""
+    print(f"Columnar dataset saved: {context['export_dir']} ({len(operator_paths)} operator partitions)")
+    return list(operator_paths.values())
+
+def open_value_stats(operator, settings):
+    import Valuestats
+    return Valuestats.new_value_profiler()
+
+def tap_value_stats(profiler, file, source, events):
+    import Valuestats
+    return Valuestats.profile_events(profiler, events)
+
+def close_value_stats(profiler):
+    import Valuestats
+    return Valuestats.finish_value_profiler(profiler)
+
+def finish_value_stats(operator_profiles, context):
+    import Valuestats
+    profiles = Valuestats.merge_operator_profiles(operator_profiles.values())
+    Valuestats.save_value_stats(profiles, context["output_dir"])
+    return profiles
+
+def finish_snapshot(operator_results, context):
+    import Templatediff
+    templates = context["results"]["template"]
+    snapshot = Templatediff.snapshot_templates(templates["operators"], templates["global"])
+    snapshot_name = f"template_snapshot_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    Templatediff.save_snapshot(snapshot, os.path.join(context["snapshot_dir"], snapshot_name))
+    return snapshot
+
+def finish_overlap(operator_results, context):
+    """Common parameters within and across operators (heatmaps: figures stage, or shown with show_figures)."""
+    umt.analyze_common_parameters(context["results"]["param_sets"], plot=context["show_figures"])
+
+def finish_families(operator_results, context):
+    umt.analyze_template_families(context["results"]["param_sets"])
+
+def finish_sections(operator_results, context):
+    umt.analyze_section_distribution(context["results"]["count"], plot=context["show_figures"])
+
+def finish_figures(operator_results, context):
+    """Render the overlap heatmaps (after overlap) and the section chart (after count) to figure_dir."""
+    import Reports
+    results = context["results"]
+    return Reports.render_reports(
+        results.get("param_sets", {}), results.get("count"), context["figure_dir"], context["workers"],
+        overlap="overlap" in results,
+    )
+
+STAGES = {
+    "count": {"new": new_count, "add": add_count},
+    "template": {"new": new_template, "add": add_template, "operator": operator_template, "finish": finish_template},
+    "param_sets": {"new": new_param_sets, "add": add_param_sets, "finish": finish_param_sets},
+    "structure": {"new": new_structure, "add": add_structure, "finish": finish_structure},
+    "index": {"start": start_index, "new": new_postings, "add": add_postings, "operator": operator_postings,
+              "finish": finish_index},
+    "prevalence": {"start": start_prevalence, "new": new_prevalence, "add": add_prevalence,
+                   "operator": operator_prevalence, "finish": finish_prevalence},
+    "export": {"start": start_export, "open": open_export, "tap": tap_export, "close": umt.close_columnar_export,
+               "finish": finish_export},
+    "value_stats": {"open": open_value_stats, "tap": tap_value_stats, "close": close_value_stats,
+                    "finish": finish_value_stats},
+    "snapshot": {"finish": finish_snapshot, "requires": ("template",)},
+    "overlap": {"finish": finish_overlap, "requires": ("param_sets",)},
+    "families": {"finish": finish_families, "requires": ("param_sets",)},
+    "sections": {"finish": finish_sections, "requires": ("count",)},
+    "figures": {"finish": finish_figures},
+}
+
+def pipeline_context(base_directory, output_dir, workers=1, figure_dir=None, structure_threshold=None,
+                     index_path=None, export_dir=None, metrics=None, compact=False, shard=None,
+                     near_common_threshold=0.95, prevalence_sketch=None, top_k=100, snapshot_dir=None,
+                     show_figures=False):
+    """Settings shared by all stages; stage-specific paths default to files under output_dir."""
+    if compact:
+        import Compactstore
+        symbols = Compactstore.SymbolTable()  # Shared by all operators' compact templates and parameter sets
+    else:
+        symbols = None
+
+    return {
+        "base_directory": base_directory,
+        "output_dir": output_dir,
+        "workers": workers,
+        "figure_dir": figure_dir or os.path.join(output_dir, "figures"),
+        "structure_threshold": structure_threshold,
+        "index_path": index_path or os.path.join(output_dir, "parameter_index.sqlite"),
+        "export_dir": export_dir or os.path.join(output_dir, "parsed_dataset"),
+        "metrics": metrics,
+        "compact": compact,
+        "symbols": symbols,
+        "shard": shard,
+        "near_common_threshold": near_common_threshold,
+        "prevalence_sketch": prevalence_sketch,
+        "top_k": top_k,
+        "snapshot_dir": snapshot_dir or os.path.join(output_dir, "snapshots"),
+        "show_figures": show_figures,
+        "executor": None,
+        "operator_csvs": {},
+        "results": {},
+    }
+
+def select_stages(stages):
+    """[(name, stage)] for stage names, checking each runs after the stages it requires."""
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stages: {', '.join(unknown)}")
+
+    for position, name in enumerate(stages):
+        missing = [required for required in STAGES[name].get("requires", ()) if required not in stages[:position]]
+        if missing:
+            raise ValueError(f"stage {name} needs {', '.join(missing)} to run before it")
+    return [(name, STAGES[name]) for name in stages]
+
+def finish_stages(stages, operator_results, context):
+    """Run the finish step of each stage in order; returns {stage name: stage result}.
+
+    Also usable on per-operator results produced elsewhere (e.g. by Asyncpipeline).
+    """
+    metrics = context["metrics"]
+    for name, stage in select_stages(list(stages)):
+        if "finish" in stage:
+            with Metrics.stage(metrics, name):
+                context["results"][name] = stage["finish"](operator_results.get(name, {}), context)
+        elif name in operator_results:
+            context["results"][name] = operator_results[name]
+    return context["results"]
+
+def walk_operators(base_directory, shard=None):
+    """{operator: [(file, source)]} for every operator directory, keeping only a hash shard's share.
+
+    file is the CSV's path within the operator (umt.source_name), so CSVs with the
+    same name in different directories or ZIPs stay apart in per-CSV results.
+    """
+    operator_csvs = {}
+    for operator in os.listdir(base_directory):
+        operator_path = os.path.join(base_directory, operator)
+        if os.path.isdir(operator_path):
+            sources = [source for _, source in umt.collect_operator_csvs(operator_path)]
+            if shard is not None and shard != "local":
+                sources = [source for source in sources if umt.in_shard(operator_path, source, shard)]
+            operator_csvs[operator] = [(umt.source_name(operator_path, source), source) for source in sources]
+    return operator_csvs
+
+def deduplicate(operator_csvs, executor, chunksize, cache, dedup, output_dir):
+    """Hash every CSV, report duplicate groups and return (representatives, sources) to parse.
+
+    With dedup "once", repeats within an operator are also dropped from operator_csvs.
+    """
+    sources = [source for csv_files in operator_csvs.values() for _, source in csv_files]
+    representatives, duplicate_groups = umt.find_duplicates(sources, executor, chunksize, cache)
+    names = [f"{operator}/{file}" for operator, csv_files in operator_csvs.items() for file, _ in csv_files]
+    os.makedirs(output_dir, exist_ok=True)
+    umt.save_duplicate_report(names, duplicate_groups, os.path.join(output_dir, "duplicate_report.txt"))
+
+    if dedup == "once":  # Drop repeats within an operator; each operator still counts its copy
+        kept = []
+        index = 0
+        for operator, csv_files in operator_csvs.items():
+            seen = set()
+            operator_kept = []
+            for entry in csv_files:
+                if representatives[index] not in seen:
+                    seen.add(representatives[index])
+                    operator_kept.append(entry)
+                    kept.append(index)
+                index += 1
+            operator_csvs[operator] = operator_kept
+
+        # A representative is the first copy overall, so it is always kept
+        renumbered = {old: new for new, old in enumerate(kept)}
+        representatives = [renumbered[representatives[old]] for old in kept]
+        sources = [sources[old] for old in kept]
+
+    return representatives, sources
+
+def parse_operator_values(entry, parser, value_stages, settings, measure=False):
+    """Read each of one operator's CSVs once, yielding its partial and feeding every value stage's tap.
+
+    Runs in a worker process. Returns ([(partial, stats)], {stage name: operator result});
+    stats is None unless measure.
+    """
+    operator, csv_files = entry
+    events = PARSER_EVENTS[parser]
+    sinks = [(name, STAGES[name], STAGES[name]["open"](operator, settings)) for name in value_stages]
+    parsed = []
+
+    for file, source in csv_files:
+        def parse(source):
+            stream = events(source)
+            for _, stage, sink in sinks:
+                stream = stage["tap"](sink, file, source, stream)
+            return umt.build_partial(stream)
+
+        parsed.append(umt.parse_csv_partial_measured(source, parse) if measure else (parse(source), None))
+
+    return parsed, {name: stage["close"](sink) for name, stage, sink in sinks}
+
+def iter_operator_values(operator_csvs, executor, parser, value_stages, context, operator_results):
+    """iter_parsed for runs with value stages: one task per operator, a bounded window ahead.
+
+    Each operator's value stage results are stored in operator_results before its
+    partials are yielded.
+    """
+    settings = {name: context[name] for name in ("base_directory", "output_dir", "export_dir")}
+    task = functools.partial(parse_operator_values, parser=parser, value_stages=value_stages, settings=settings,
+                             measure=context["metrics"] is not None)
+    entries = list(operator_csvs.items())
+    if executor is None:
+        results = map(task, entries)
+    else:
+        results = Helpers.bounded_map(executor, task, entries, 1, context["workers"])
+
+    for (operator, _), (parsed, values) in zip(entries, results):
+        for name, value in values.items():
+            operator_results[name][operator] = value
+        yield from parsed
+
+def run_pipeline(base_directory, output_dir, parser="sections", stages=("count", "template"), workers=1,
+                 cache_path=None, cache_hash=False, cache_max_bytes=umt.PARSE_CACHE_MAX_BYTES, dedup=None,
+                 **settings):
+    """Parse every operator's CSVs once and run the selected stages over the shared partials.
+
+    Returns {stage name: stage result}. With workers > 1 CSVs are parsed in a
+    process pool, a bounded window ahead of the reduction; results match a serial
+    run. With cache_path, partials persist between runs and only new or changed
+    CSVs are parsed again (cache_hash forgives a touched mtime if the content is
+    unchanged). With dedup, each distinct payload is parsed once: "count" still
+    counts every copy, "once" counts identical CSVs once per operator. With
+    export or value_stats, each operator's CSVs are read in one task that also
+    feeds those stages (see parse_operator_values). settings are passed to
+    pipeline_context (figure_dir, index_path, shard, compact, ...).
+    """
+    selected = select_stages(list(stages))
+    context = pipeline_context(base_directory, output_dir, workers, **settings)
+    metrics = context["metrics"]
+    operator_results = {name: {} for name, stage in selected if "new" in stage or "tap" in stage}
+    value_stages = tuple(name for name, stage in selected if "tap" in stage)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with Metrics.stage(metrics, "walk"):
+        operator_csvs = context["operator_csvs"] = walk_operators(base_directory, context["shard"])
+    sources = [source for csv_files in operator_csvs.values() for _, source in csv_files]
+
+    cache = umt.open_parse_cache(cache_path) if cache_path else None
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with executor or contextlib.nullcontext():
+            context["executor"] = executor
+            chunksize = Helpers.pool_chunksize(len(sources), workers)
+            window = 2 * workers  # Chunks parsed ahead of the reduction, bounding partials in memory
+
+            if dedup is not None:
+                with Metrics.stage(metrics, "dedup"):
+                    representatives, sources = deduplicate(operator_csvs, executor, chunksize, cache, dedup,
+                                                           output_dir)
+
+            if value_stages:  # Every CSV is read for its values anyway
+                parsed = iter_operator_values(operator_csvs, executor, parser, value_stages, context,
+                                              operator_results)
+            elif dedup is not None:
+                parsed = umt.parse_deduplicated(sources, representatives, executor, chunksize, cache, cache_hash,
+                                                metrics is not None, PARSERS[parser], window)
+            else:
+                parsed = umt.iter_parsed(sources, executor, chunksize, cache, cache_hash, metrics is not None,
+                                         PARSERS[parser], window)
+
+            for name, stage in selected:
+                if "start" in stage:
+                    with Metrics.stage(metrics, name):
+                        context["results"][name] = stage["start"](context)
+
+            # Partials are consumed one operator at a time and released after reduction
+            for operator, csv_files in operator_csvs.items():
+                print(f"Processing Operator: {operator}")
+
+                with Metrics.stage(metrics, "parse"):
+                    operator_parsed = list(itertools.islice(parsed, len(csv_files)))
+
+                if metrics is not None:
+                    for (file, _), (_, stats) in zip(csv_files, operator_parsed):
+                        if stats is None:
+                            Metrics.record_cached_file(metrics, operator)
+                        else:
+                            Metrics.record_file(metrics, operator, file, stats)
+
+                start = time.perf_counter()
+                with Metrics.stage(metrics, "reduce"):
+                    states = [(name, stage, stage["new"](context)) for name, stage in selected if "new" in stage]
+                    for (file, source), (partial, _) in zip(csv_files, operator_parsed):
+                        if not partial[1]:  # Empty CSV
+                            continue
+                        for _, stage, state in states:
+                            stage["add"](state, file, source, partial)
+                if metrics is not None:
+                    Metrics.record_reduce(metrics, operator, time.perf_counter() - start)
+                del operator_parsed
+
+                for name, stage, state in states:
+                    with Metrics.stage(metrics, name):
+                        operator_results[name][operator] = stage.get("operator", keep_state)(state, operator, context)
+                del states
+
+            next(parsed, None)  # Let the parser finish (and print its cache summary)
+
+        if cache is not None:
+            umt.evict_parse_cache(cache, cache_max_bytes)
+            cache.commit()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    context["executor"] = None
+    return finish_stages([name for name, _ in selected], operator_results, context)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build master templates and reports in one pass over every CSV.")
+    parser.add_argument("base_directory", help="Directory with one subdirectory per operator")
+    parser.add_argument("output_dir", help="Where master templates are written")
+    parser.add_argument("--parser", choices=sorted(PARSERS), default="sections",
+                        help="sections: parameter_mode (default); scan: same result, faster; lookahead: Mt.py/Ne.py")
+    parser.add_argument("--stages", default="count,template,sections",
+                        help=f"Comma-separated stages, run in this order: {', '.join(STAGES)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parse in this many processes")
+    parser.add_argument("--cache", help="Parse cache file; only new or changed CSVs are parsed again")
+    parser.add_argument("--figure-dir", help="Where the figures stage renders (default: output_dir/figures)")
+    parser.add_argument("--structure-threshold", type=float,
+                        help="e.g. 0.8 to also group near-identical section structures with MinHash LSH")
+    args = parser.parse_args(argv)
+
+    stages = [name.strip() for name in args.stages.split(",") if name.strip()]
+    try:
+        select_stages(stages)
+    except ValueError as error:
+        parser.error(str(error))
+
+    run_pipeline(args.base_directory, args.output_dir, args.parser, stages, args.workers, args.cache,
+                 figure_dir=args.figure_dir, structure_threshold=args.structure_threshold)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import csv
+import heapq
+from array import array
+import numpy as np
+import Compactstore
+from Helpers import wrapping_multiply
+import Updatedmastertemplate as umt
+
+ANY_SECTION = "*"  # Scope for a parameter's prevalence regardless of section
+COUNT_TYPE = "Q"
+SKETCH_SEED = 7  # Shared by all counters so sketches from different operators can be merged
+
+# A counter streams per-CSV partials into "how many files contain section S" and "how many
+# files contain parameter P in section S" without keeping the per-CSV parameter sets.
+# Exact counters store one integer per interned (section, parameter) pair in a flat array;
+# with sketch=(width, depth, capacity) pair counts go to a Count-Min sketch instead and only
+# the `capacity` heaviest candidates per section are remembered, so memory stays bounded.
+
+def new_counter(sketch=None):
+    """Create an empty prevalence counter, exact or Count-Min backed."""
+    counter = {
+        "files": 0,
+        "section_files": {},  # Exact: sections are few
+        "pairs": Compactstore.SymbolTable(),  # (section, parameter) -> slot in counts
+        "counts": array(COUNT_TYPE),
+        "sketch": None,
+    }
+    if sketch is not None:
+        width, depth, capacity = sketch
+        if width & (width - 1):
+            raise ValueError("sketch width must be a power of two")
+        rng = np.random.default_rng(SKETCH_SEED)
+        counter["sketch"] = {
+            "table": np.zeros((depth, width), dtype=np.uint32),
+            "multipliers": rng.integers(1, 1 << 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1),
+            "shift": np.uint64(64 - width.bit_length() + 1),
+            "capacity": capacity,
+            "candidates": {},  # section -> {parameter: estimated count}
+            "heaps": {},  # section -> min-heap of (estimate, parameter), one entry per candidate
+        }
+    return counter
+
+def _sketch_columns(sketch, keys):
+    """Multiply-shift hash of each key into every sketch row: a (depth, len(keys)) index array."""
+    import pandas as pd
+
+    hashes = pd.util.hash_array(np.array([f"{section}\x1f{param}" for section, param in keys], dtype=object))
+    return wrapping_multiply(sketch["multipliers"][:, None], hashes[None, :]) >> sketch["shift"]
+
+def _sketch_add(sketch, keys, amounts=1):
+    """Add to the Count-Min sketch and refresh each section's heavy-hitter candidates.
+
+    Each section keeps one min-heap entry per candidate. An entry may hold an older,
+    lower estimate; it is only brought up to date when it reaches the top, so a key
+    costs O(1) unless it displaces the weakest candidate (O(log capacity)).
+    """
+    columns = _sketch_columns(sketch, keys).astype(np.int64)
+    table = sketch["table"]
+    if amounts:
+        cells, counts = np.unique(columns + (np.arange(len(columns)) * table.shape[1])[:, None], return_counts=True)
+        table.ravel()[cells] += (counts * amounts).astype(table.dtype)  # Colliding keys are added up
+    estimates = table[np.arange(len(columns))[:, None], columns].min(axis=0)
+
+    capacity = sketch["capacity"]
+    section = None
+    for (key_section, param), estimate in zip(keys, estimates.tolist()):
+        if key_section != section:  # Keys arrive grouped by section
+            section = key_section
+            candidates = sketch["candidates"].setdefault(section, {})
+            heap = sketch["heaps"].setdefault(section, [])
+            floor = 0  # Lower bound on the weakest candidate's estimate
+
+        if param in candidates:
+            candidates[param] = estimate
+            continue
+        if len(candidates) < capacity:
+            candidates[param] = estimate
+            heapq.heappush(heap, (estimate, param))
+            continue
+        if estimate <= floor:
+            continue
+
+        while heap[0][0] != candidates[heap[0][1]]:  # Bring the top entry up to date
+            heapq.heapreplace(heap, (candidates[heap[0][1]], heap[0][1]))
+        floor = heap[0][0]
+        if estimate > floor:
+            del candidates[heapq.heapreplace(heap, (estimate, param))[1]]
+            candidates[param] = estimate
+
+def add_partial(counter, partial):
+    """Count one CSV's partial; empty CSVs are skipped as in reduce_partials."""
+    _, section_params = partial
+    if not section_params:
+        return
+
+    counter["files"] += 1
+    section_files = counter["section_files"]
+    keys = []
+    csv_params = set()
+
+    for section, params in section_params.items():
+        section_files[section] = section_files.get(section, 0) + 1
+        keys.extend((section, param) for param in params)
+        csv_params.update(params)
+
+    section_files[ANY_SECTION] = section_files.get(ANY_SECTION, 0) + 1
+    keys.extend((ANY_SECTION, param) for param in csv_params)
+
+    if counter["sketch"] is not None:
+        if keys:
+            _sketch_add(counter["sketch"], keys)
+        return
+
+    pairs, counts = counter["pairs"], counter["counts"]
+    for key in keys:
+        slot = pairs.intern(key)
+        if slot == len(counts):
+            counts.append(1)
+        else:
+            counts[slot] += 1
+
+def add_partials(counter, partials):
+    """Count a stream of partials."""
+    for partial in partials:
+        add_partial(counter, partial)
+
+def merge_counter(into, other):
+    """Add other's counts into `into`; both must be exact or share the sketch shape."""
+    into["files"] += other["files"]
+    for section, files in other["section_files"].items():
+        into["section_files"][section] = into["section_files"].get(section, 0) + files
+
+    if into["sketch"] is not None:
+        into["sketch"]["table"] += other["sketch"]["table"]
+        keys = [
+            (section, param)
+            for section, candidates in other["sketch"]["candidates"].items() for param in candidates
+        ]
+        keys.extend(
+            (section, param)
+            for section, candidates in into["sketch"]["candidates"].items() for param in candidates
+        )
+        if keys:
+            _sketch_add(into["sketch"], keys, 0)  # Re-estimate candidates against the merged table
+        return
+
+    pairs, counts = into["pairs"], into["counts"]
+    for key, count in zip(other["pairs"].names, other["counts"]):
+        slot = pairs.intern(key)
+        if slot == len(counts):
+            counts.append(count)
+        else:
+            counts[slot] += count
+
+def parameter_counts(counter):
+    """{section: {parameter: files}}; estimates for candidates only when sketched."""
+    if counter["sketch"] is not None:
+        return counter["sketch"]["candidates"]
+
+    by_section = {}
+    for (section, param), count in zip(counter["pairs"].names, counter["counts"]):
+        by_section.setdefault(section, {})[param] = count
+    return by_section
+
+def prevalence_table(counter, top_k=100):
+    """Top-K rows (scope, parameter, files, prevalence) per section and for ANY_SECTION.
+
+    Prevalence is the share of the files containing the section that also contain
+    the parameter there; for ANY_SECTION it is the share of all files.
+    """
+    rows = []
+    for section, counts in parameter_counts(counter).items():
+        section_files = counter["section_files"][section]
+        top = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        rows.extend((section, param, count, count / section_files) for param, count in top)
+    return rows
+
+def near_common_template(counter, threshold=0.95):
+    """Master template keeping only parameters with prevalence >= threshold in their section."""
+    template = {}
+    counts_by_section = parameter_counts(counter)
+    for section, section_files in counter["section_files"].items():
+        if section == ANY_SECTION:
+            continue
+        counts = counts_by_section.get(section, {})
+        template[section] = sorted(param for param, count in counts.items() if count >= threshold * section_files)
+    return template
+
+def save_prevalence(counter, name, output_dir, threshold=0.95, top_k=100):
+    """Write prevalence_<name>.csv and near_common_template_<name>.txt."""
+    os.makedirs(output_dir, exist_ok=True)
+    table_path = os.path.join(output_dir, f"prevalence_{name}.csv")
+
+    with open(table_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["section", "parameter", "files", "prevalence"])
+        for section, param, count, prevalence in prevalence_table(counter, top_k):
+            writer.writerow([section, param, count, f"{prevalence:.4f}"])
+
+    template = near_common_template(counter, threshold)
+    template_path = os.path.join(output_dir, f"near_common_template_{name}.txt")
+    umt.write_template_file(template_path, template)
+
+    kind = "estimated" if counter["sketch"] is not None else "exact"
+    print(f"Near-common template saved: {template_path} "
+          f"({sum(map(len, template.values()))} parameters in >= {threshold:.0%} of files, {kind})")
+    return template
@@ -0,0 +1,162 @@
+import os
+import html
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import Helpers
+import Updatedmastertemplate as umt
+
+# Batch report stage: every overlap matrix and the section chart are computed in the main
+# process, then rendered straight to PNG files by worker processes and linked from one
+# report.html. Matrices with more than MAX_CELLS rows are cluster-ordered and binned so a
+# figure never has more than MAX_CELLS x MAX_CELLS cells, whatever the number of CSVs.
+
+MAX_CELLS = 100  # Larger matrices are binned down to this many rows and columns
+ANNOT_MAX = 25  # Cells are annotated with their value only up to this many rows
+LABEL_MAX = 60  # Tick labels are drawn only up to this many rows
+DPI = 100
+
+def cluster_order(matrix):
+    """Row order that puts CSVs with identical parameter sets together, similar ones nearby.
+
+    Columns are ranked by frequency and rows sorted lexicographically on them, so
+    rows sharing the most common parameters end up adjacent.
+    """
+    columns = np.argsort(-matrix.sum(axis=0), kind="stable")
+    _, groups = np.unique(np.packbits(matrix[:, columns], axis=1), axis=0, return_inverse=True)
+    return np.argsort(groups.ravel(), kind="stable")
+
+def binned_overlap(matrix, max_cells=MAX_CELLS):
+    """Mean pairwise overlap between bins of consecutive rows, without the full n x n matrix.
+
+    With bin indicator B the block sums of X X^T are (B X)(B X)^T, so only a
+    bins x parameters matrix is formed.
+    """
+    bins = np.linspace(0, len(matrix), max_cells + 1).astype(np.int64)
+    sums = np.add.reduceat(matrix.astype(np.float32), bins[:-1], axis=0)
+    sizes = np.diff(bins).astype(np.float64)
+    return (sums @ sums.T) / np.outer(sizes, sizes), bins
+
+def overlap_figure(matrix, labels, name, title, axis_label, cmap, max_cells=MAX_CELLS):
+    """Heatmap job for the pairwise overlap of encoded parameter sets, downsampled when large."""
+    if len(matrix) <= max_cells:
+        values = umt.overlap_matrix(matrix)
+        shown_labels = labels if len(labels) <= LABEL_MAX else False
+    else:
+        order = cluster_order(matrix)
+        values, bins = binned_overlap(matrix[order], max_cells)
+        shown_labels = False
+        axis_label = f"{axis_label} (cluster-ordered, ~{bins[-1] / max_cells:.0f} per cell, mean overlap)"
+
+    return {
+        "kind": "heatmap",
+        "name": name,
+        "title": title,
+        "values": values,
+        "labels": shown_labels,
+        "axis_label": axis_label,
+        "cmap": cmap,
+        "annot": len(values) <= ANNOT_MAX,
+    }
+
+def overlap_figures(operator_param_sets, max_cells=MAX_CELLS):
+    """Heatmap jobs for each operator's CSVs and for the operators' common parameters."""
+    figures = []
+    common_params = {}
+
+    for operator, csv_param_sets in operator_param_sets.items():
+        if not csv_param_sets:
+            continue
+        matrix, vocabulary = Helpers.param_set_matrix(csv_param_sets)
+
+        common_params[operator] = set(vocabulary[matrix.all(axis=0)])
+
+        figures.append(overlap_figure(
+            matrix, list(csv_param_sets.keys()), f"parameter_similarity_{operator}",
+            f"Parameter Similarity Heatmap - {operator}", "CSV Files", "Blues", max_cells,
+        ))
+
+    if common_params:
+        operators = list(common_params)
+        matrix, _ = Helpers.encode_param_sets([common_params[operator] for operator in operators])
+        figures.append(overlap_figure(
+            matrix, operators, "operator_parameter_overlap",
+            "Operator-Wise Parameter Overlap Heatmap", "Operators", "Greens", max_cells,
+        ))
+
+    return figures
+
+def section_figure(operator_section_counts):
+    """Stacked bar chart job for the section type distribution across operators."""
+    section_df = pd.DataFrame(operator_section_counts).fillna(0).astype(int)
+    return {
+        "kind": "sections",
+        "name": "section_distribution",
+        "title": "Section Type Distribution Across Operators",
+        "values": section_df,
+    }
+
+def render_figure(job, figure_dir):
+    """Render one job to figure_dir/<name>.png; runs in a worker process."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure  # No pyplot: figures are not tracked or shown
+    import seaborn as sns
+
+    if job["kind"] == "heatmap":
+        cells = len(job["values"])
+        size = min(6 + cells * 0.12, 24)  # Grow with the matrix up to a readable maximum
+        figure = Figure(figsize=(size + 2, size))
+        ax = figure.subplots()
+        sns.heatmap(
+            job["values"], ax=ax, cmap=job["cmap"], annot=job["annot"], fmt=".0f",
+            xticklabels=job["labels"], yticklabels=job["labels"],
+        )
+        ax.set_xlabel(job["axis_label"])
+        ax.set_ylabel(job["axis_label"])
+    else:
+        section_df = job["values"]
+        figure = Figure(figsize=(min(10 + 0.2 * section_df.shape[1], 40), 6))
+        ax = figure.subplots()
+        section_df.T.plot(kind="bar", stacked=True, ax=ax, colormap="viridis")
+        ax.set_xlabel("Operators")
+        ax.set_ylabel("Section Count")
+        ax.legend(title="Section Type", bbox_to_anchor=(1, 1))
+
+    ax.set_title(job["title"])
+    file_path = os.path.join(figure_dir, f"{job['name']}.png")
+    figure.savefig(file_path, bbox_inches="tight", dpi=DPI)
+    return file_path
+
+def save_report_html(figure_dir, jobs, paths):
+    """Write report.html showing every rendered figure."""
+    file_path = os.path.join(figure_dir, "report.html")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Template report</title></head><body>\n")
+        for job, path in zip(jobs, paths):
+            f.write(f"<h2>{html.escape(job['title'])}</h2>\n")
+            f.write(f"<img src=\"{html.escape(os.path.basename(path))}\" alt=\"{html.escape(job['name'])}\">\n")
+        f.write("</body></html>\n")
+    return file_path
+
+def render_reports(operator_param_sets, operator_section_counts, figure_dir, workers=1, overlap=True,
+                   max_cells=MAX_CELLS):
+    """Render all overlap heatmaps and the section chart to figure_dir, in parallel with workers > 1.
+
+    With overlap False only the section chart is drawn (e.g. when MinHash
+    families replace the heatmaps); with operator_section_counts None it is not.
+    """
+    os.makedirs(figure_dir, exist_ok=True)
+    jobs = overlap_figures(operator_param_sets, max_cells) if overlap else []
+    if operator_section_counts is not None:
+        jobs.append(section_figure(operator_section_counts))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            paths = list(executor.map(render_figure, jobs, [figure_dir] * len(jobs)))
+    else:
+        paths = [render_figure(job, figure_dir) for job in jobs]
+
+    report_path = save_report_html(figure_dir, jobs, paths)
+    print(f"Report saved: {report_path} ({len(paths)} figures)")
+    return paths
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import functools
+
+SHARD_SCHEMA_VERSION = 1
+
+# A shard result holds, per operator, everything the master templates are built from:
+#   {"schema_version": 1, "nodes": [...], "operators": [[operator, {
+#       "templates": [[section, [params]]], "section_counts": [[section, count]],
+#       "param_sets": [[file, [params]]]}]]}
+# Sections and files are stored as [key, value] pairs so order and null sections survive JSON.
+# A file is the CSV's path within its operator (Updatedmastertemplate.source_name), so CSVs
+# with the same name in different directories stay separate entries across shards.
+
+def shard_result(operator_templates, operator_section_counts, operator_param_sets, node=None):
+    """Pack the return values of process_all_operators into a self-describing shard result."""
+    operators = []
+    for operator, template in operator_templates.items():
+        param_sets = operator_param_sets.get(operator, {})
+        operators.append([operator, {
+            "templates": [[section, sorted(params)] for section, params in template.items()],
+            "section_counts": [[section, count] for section, count in operator_section_counts[operator].items()],
+            "param_sets": [[file, sorted(param_sets[file])] for file in param_sets],
+        }])
+
+    return {
+        "schema_version": SHARD_SCHEMA_VERSION,
+        "nodes": [node or socket.gethostname()],
+        "operators": operators,
+    }
+
+def save_shard(result, file_path):
+    """Write a shard result as JSON, atomically."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, file_path)
+
+    print(f"Shard result saved: {file_path}")
+
+def load_shard(file_path):
+    """Read a shard result, rejecting files written with another schema version."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+
+    version = result.get("schema_version")
+    if version != SHARD_SCHEMA_VERSION:
+        raise ValueError(f"{file_path}: shard schema version {version}, expected {SHARD_SCHEMA_VERSION}")
+    return result
+
+def _merge_pairs(left, right, combine):
+    """Merge two [key, value] pair lists in first-seen key order."""
+    merged = {}
+    keys = []
+    for key, value in left + right:
+        if key in merged:
+            merged[key] = combine(merged[key], value)
+        else:
+            merged[key] = value
+            keys.append(key)
+    return [[key, merged[key]] for key in keys]
+
+def _union(left, right):
+    return sorted(set(left).union(right))
+
+def _merge_operator(left, right):
+    return {
+        "templates": _merge_pairs(left["templates"], right["templates"], _union),
+        "section_counts": _merge_pairs(left["section_counts"], right["section_counts"], lambda a, b: a + b),
+        "param_sets": _merge_pairs(left["param_sets"], right["param_sets"], _union),
+    }
+
+def merge_shards(left, right):
+    """Combine two shard results into one.
+
+    Templates and parameter sets are unions, section counts are sums and keys keep
+    their first-seen order, so merge_shards(a, merge_shards(b, c)) equals
+    merge_shards(merge_shards(a, b), c) and partials can be reduced hierarchically.
+    A CSV path present in both sides (e.g. in two nodes' local trees) gets the
+    union of its parameters.
+    """
+    return {
+        "schema_version": SHARD_SCHEMA_VERSION,
+        "nodes": left["nodes"] + right["nodes"],
+        "operators": _merge_pairs(left["operators"], right["operators"], _merge_operator),
+    }
+
+def merge_shard_files(file_paths):
+    """Load and merge any number of shard result files in the order given."""
+    return functools.reduce(merge_shards, (load_shard(file_path) for file_path in file_paths))
+
+def unpack_shard(result):
+    """Inverse of shard_result: (operator_templates, operator_section_counts, operator_param_sets)."""
+    operator_templates = {}
+    operator_section_counts = {}
+    operator_param_sets = {}
+
+    for operator, data in result["operators"]:
+        operator_templates[operator] = {section: params for section, params in data["templates"]}
+        operator_section_counts[operator] = {section: count for section, count in data["section_counts"]}
+        operator_param_sets[operator] = {file: set(params) for file, params in data["param_sets"]}
+
+    return operator_templates, operator_section_counts, operator_param_sets
+
+def save_merged_templates(result, output_dir):
+    """Write the per-operator and global master templates of a (merged) shard result."""
+    import Updatedmastertemplate
+
+    operator_templates, _, _ = unpack_shard(result)
+    for operator, template in operator_templates.items():
+        Updatedmastertemplate.save_master_template(operator, template, output_dir)
+
+    global_template = Updatedmastertemplate.merge_global_master(operator_templates)
+    Updatedmastertemplate.save_global_master_template(global_template, output_dir)
+    return operator_templates, global_template
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge shard results written by process_all_operators(shard=...).")
+    parser.add_argument("shards", nargs="+", help="Shard result files, merged in the order given")
+    parser.add_argument("--output", help="Write the merged result as a new shard file (for hierarchical merges)")
+    parser.add_argument("--output-dir", help="Write per-operator and global master templates here")
+    args = parser.parse_args(argv)
+
+    if args.output is None and args.output_dir is None:
+        parser.error("give --output, --output-dir or both")
+
+    result = merge_shard_files(args.shards)
+    print(f"Merged {len(args.shards)} shard files from {len(result['nodes'])} nodes, "
+          f"{len(result['operators'])} operators")
+
+    if args.output is not None:
+        save_shard(result, args.output)
+    if args.output_dir is not None:
+        save_merged_templates(result, args.output_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
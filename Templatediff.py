@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+
+SNAPSHOT_SCHEMA_VERSION = 1
+
+# A snapshot stores every template as sorted parameter ID arrays over one vocabulary that is
+# itself sorted, so ID order is name order:
+#   {"schema_version": 1, "created": ..., "names": [sorted parameter names],
+#    "operators": [[operator, [[section, [ids]]]]], "global": [[section, [ids]]]}
+# Diffs are sorted-array merges (searchsorted) on IDs; two snapshots are first mapped onto
+# the union of their vocabularies, which is monotonic and so keeps every array sorted.
+
+def snapshot_templates(operator_templates, global_template):
+    """Build a snapshot from merge_templates / merge_global_master outputs."""
+    names = sorted({
+        param
+        for template in itertools.chain(operator_templates.values(), [global_template])
+        for params in template.values() for param in params
+    })
+    ids = {name: i for i, name in enumerate(names)}
+
+    def encode(template):
+        return [[section, sorted(ids[param] for param in params)] for section, params in template.items()]
+
+    return {
+        "schema_version": SNAPSHOT_SCHEMA_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "names": names,
+        "operators": [[operator, encode(template)] for operator, template in operator_templates.items()],
+        "global": encode(global_template),
+    }
+
+def save_snapshot(snapshot, file_path):
+    """Write a snapshot as JSON, atomically."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, file_path)
+
+    print(f"Template snapshot saved: {file_path}")
+
+def load_snapshot(file_path):
+    """Read a snapshot into {"names": array, "operators": {op: {section: ids}}, "global": {section: ids}}."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+
+    version = snapshot.get("schema_version")
+    if version != SNAPSHOT_SCHEMA_VERSION:
+        raise ValueError(f"{file_path}: snapshot schema version {version}, expected {SNAPSHOT_SCHEMA_VERSION}")
+
+    def decode(sections):
+        return {section: np.array(ids, dtype=np.uint32) for section, ids in sections}
+
+    return {
+        "created": snapshot["created"],
+        "names": np.array(snapshot["names"], dtype=str),  # Fixed-width unicode: C-speed sort and search
+        "operators": {operator: decode(sections) for operator, sections in snapshot["operators"]},
+        "global": decode(snapshot["global"]),
+    }
+
+def remap(snapshot, names, mapping):
+    """Re-express a loaded snapshot's IDs over a larger sorted vocabulary; arrays stay sorted."""
+    def convert(template):
+        return {section: mapping[ids] for section, ids in template.items()}
+
+    return {
+        "created": snapshot["created"],
+        "names": names,
+        "operators": {operator: convert(template) for operator, template in snapshot["operators"].items()},
+        "global": convert(snapshot["global"]),
+    }
+
+def difference(a, b):
+    """IDs of sorted unique array a that are not in sorted unique array b."""
+    if not len(b):
+        return a
+    positions = np.minimum(np.searchsorted(b, a), len(b) - 1)
+    return a[b[positions] != a]
+
+def merge_vocabularies(a, b):
+    """Sorted union of two sorted name arrays plus the old -> new ID mapping of each.
+
+    Only one string search is needed (b into a); the mappings are integer arithmetic
+    on the insertion points of b's new names.
+    """
+    positions = np.searchsorted(a, b)
+    found = np.zeros(len(b), dtype=bool)
+    inside = positions < len(a)
+    found[inside] = a[positions[inside]] == b[inside]
+
+    extra, insert_at = b[~found], positions[~found]
+    a = a.astype(np.result_type(a, b))  # Widen so longer names are not truncated
+    names = np.insert(a, insert_at, extra)
+
+    map_a = np.arange(len(a)) + np.searchsorted(insert_at, np.arange(len(a)), side="right")
+    map_b = np.empty(len(b), dtype=np.int64)
+    map_b[found] = map_a[positions[found]]
+    map_b[~found] = insert_at + np.arange(len(extra))
+    return names, map_a.astype(np.uint32), map_b.astype(np.uint32)
+
+def diff_templates(old, new, names):
+    """Added/removed sections and per-section added/removed parameters between two ID templates."""
+    empty = np.zeros(0, dtype=np.uint32)
+    diff = {
+        "added_sections": [section for section in new if section not in old],
+        "removed_sections": [section for section in old if section not in new],
+        "added": {},
+        "removed": {},
+    }
+
+    for section in itertools.chain(old, (section for section in new if section not in old)):
+        old_ids, new_ids = old.get(section, empty), new.get(section, empty)
+        added, removed = difference(new_ids, old_ids), difference(old_ids, new_ids)
+        if len(added):
+            diff["added"][section] = names[added].tolist()
+        if len(removed):
+            diff["removed"][section] = names[removed].tolist()
+
+    return diff
+
+def diff_snapshots(old, new):
+    """Diff every operator and the global template between two loaded snapshots."""
+    names, old_mapping, new_mapping = merge_vocabularies(old["names"], new["names"])
+    old, new = remap(old, names, old_mapping), remap(new, names, new_mapping)
+
+    return {
+        "old": old["created"],
+        "new": new["created"],
+        "added_operators": [operator for operator in new["operators"] if operator not in old["operators"]],
+        "removed_operators": [operator for operator in old["operators"] if operator not in new["operators"]],
+        "operators": {
+            operator: diff_templates(old["operators"].get(operator, {}), new["operators"].get(operator, {}), names)
+            for operator in itertools.chain(
+                old["operators"], (operator for operator in new["operators"] if operator not in old["operators"])
+            )
+        },
+        "global": diff_templates(old["global"], new["global"], names),
+    }
+
+def diff_operators(snapshot):
+    """Pairwise diffs between the operators of one loaded snapshot: {(a, b): diff of a -> b}."""
+    operators = snapshot["operators"]
+    return {
+        (a, b): diff_templates(operators[a], operators[b], snapshot["names"])
+        for a, b in itertools.combinations(operators, 2)
+    }
+
+def is_empty(diff):
+    return not (diff["added_sections"] or diff["removed_sections"] or diff["added"] or diff["removed"])
+
+def print_diff(label, diff):
+    """Print one template diff in the repo's report style."""
+    if is_empty(diff):
+        print(f"{label}: no changes")
+        return
+
+    print(f"{label}:")
+    for section in diff["added_sections"]:
+        print(f"  + section {section}")
+    for section in diff["removed_sections"]:
+        print(f"  - section {section}")
+    for section, params in diff["added"].items():
+        print(f"  {section} + {', '.join(params)}")
+    for section, params in diff["removed"].items():
+        print(f"  {section} - {', '.join(params)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff template snapshots between runs or between operators.")
+    parser.add_argument("snapshots", nargs="+", help="OLD NEW to diff two runs, or one snapshot with --pairwise")
+    parser.add_argument("--pairwise", action="store_true", help="Diff every pair of operators in one snapshot")
+    parser.add_argument("--operator", help="Only report this operator")
+    parser.add_argument("--json", help="Also write the diff as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.pairwise:
+        if len(args.snapshots) != 1:
+            parser.error("--pairwise takes exactly one snapshot")
+        snapshot = load_snapshot(args.snapshots[0])
+        diffs = diff_operators(snapshot)
+        for (a, b), diff in diffs.items():
+            if args.operator in (None, a, b):
+                print_diff(f"{a} -> {b}", diff)
+        result = [{"from": a, "to": b, **diff} for (a, b), diff in diffs.items()]
+    else:
+        if len(args.snapshots) != 2:
+            parser.error("give OLD and NEW snapshots")
+        result = diff_snapshots(load_snapshot(args.snapshots[0]), load_snapshot(args.snapshots[1]))
+        print(f"Template changes from {result['old']} to {result['new']}")
+        for operator in result["added_operators"]:
+            print(f"+ operator {operator}")
+        for operator in result["removed_operators"]:
+            print(f"- operator {operator}")
+        for operator, diff in result["operators"].items():
+            if args.operator in (None, operator):
+                print_diff(operator, diff)
+        if args.operator is None:
+            print_diff("Global", result["global"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Diff saved: {args.json}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,36 +1,184 @@
 import os
+import io
 import zipfile
 import csv
 import collections
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import contextlib
+import functools
+import hashlib
+import mmap
+import re
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import Metrics
+from Helpers import load_plotting, finish_figure, bounded_map, encode_param_sets, param_set_matrix
+
+# numpy, pandas, seaborn, matplotlib, pyarrow, Minhash, Valuestats, Prevalence and Reports are imported
+# inside the functions that need them, so a template-only run starts at plain-Python speed.
+
+PARSE_CACHE_VERSION = 2  # Bump when parse_csv output changes to invalidate old caches
+PARSE_CACHE_MAX_BYTES = 1 << 30
+PARSE_CACHE_BLOCK = 1024  # Sources looked up, parsed and stored per cache transaction
+EXPORT_BATCH_ROWS = 1 << 16  # Value cells buffered per Parquet row group
+NESTED_ARCHIVE_CACHE = 4  # Inner ZIPs kept open in memory per process, see nested_archive
+
+nested_archives = collections.OrderedDict()  # (zip path, mtime_ns, size, member chain) -> ZipFile
+nested_archives_lock = threading.Lock()
 
 def extract_zip(zip_path, extract_to):
     """Extract ZIP file to a directory."""
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(extract_to)
 
+def list_zip_csvs(zip_path):
+    """List CSV members of a ZIP (including nested ZIPs) as (name, source) pairs without extracting."""
+    csv_members = []
+
+    def walk_archive(archive, chain):
+        for member in archive.namelist():
+            if member.endswith(".zip"):  # Nested archives are opened in memory
+                with zipfile.ZipFile(io.BytesIO(archive.read(member))) as inner:
+                    walk_archive(inner, chain + (member,))
+            elif member.endswith(".csv"):
+                name = "/".join((os.path.basename(zip_path),) + chain + (member,))
+                csv_members.append((name, (zip_path, chain + (member,))))
+
+    with zipfile.ZipFile(zip_path, 'r') as archive:
+        walk_archive(archive, ())
+
+    return csv_members
+
+@contextlib.contextmanager
+def open_csv_source(source):
+    """Open a CSV source as a text stream: a file path, a (zip_path, member_chain) tuple
+    or the file's bytes already read into memory."""
+    if isinstance(source, bytes):
+        yield io.TextIOWrapper(io.BytesIO(source), encoding='utf-8')
+        return
+
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield f
+        return
+
+    with open_source_bytes(source) as raw:
+        yield io.TextIOWrapper(raw, encoding='utf-8')
+
+def nested_archive(zip_path, chain):
+    """The ZIP nested at member chain inside zip_path, opened from memory.
+
+    Recently used inner archives stay open, so reading every member of a nested
+    ZIP decompresses it and parses its directory once instead of once per member.
+    """
+    stat = os.stat(zip_path)
+    key = (os.path.abspath(zip_path), stat.st_mtime_ns, stat.st_size, chain)
+    with nested_archives_lock:  # Asyncpipeline reads sources from several threads
+        if key in nested_archives:
+            nested_archives.move_to_end(key)
+            return nested_archives[key]
+
+    if len(chain) == 1:
+        with zipfile.ZipFile(zip_path, 'r') as archive:
+            data = archive.read(chain[0])
+    else:
+        data = nested_archive(zip_path, chain[:-1]).read(chain[-1])
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    with nested_archives_lock:
+        nested_archives[key] = archive
+        if len(nested_archives) > NESTED_ARCHIVE_CACHE:
+            nested_archives.popitem(last=False)  # Not closed: another thread may still be reading it
+    return archive
+
+def open_archive(zip_path, chain):
+    """Context manager for the ZIP at member chain inside zip_path (zip_path itself for an empty chain)."""
+    if not chain:
+        return zipfile.ZipFile(zip_path, 'r')
+    return contextlib.nullcontext(nested_archive(zip_path, chain))  # Stays open in nested_archives
+
+@contextlib.contextmanager
+def open_source_bytes(source):
+    """Open a CSV source as a binary stream, descending into nested ZIPs."""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield f
+        return
+
+    zip_path, members = source
+    with open_archive(zip_path, members[:-1]) as archive, archive.open(members[-1]) as f:
+        yield f
+
+CELL_SEPARATOR = "\x1f"  # ASCII unit separator, joins a row's cells for a single replace pass
+
 def clean_text(text):
     """Remove unwanted characters and normalize text."""
     return text.strip().replace('"', '').replace("'", "").replace("\t", " ")
 
-def parse_csv(file_path):
-    """Parse CSV handling multi-line sections, correct parameter-value separation."""
-    sections = collections.defaultdict(lambda: {"parameters": set(), "values": []})
+def clean_row(cells, separator=CELL_SEPARATOR):
+    """Same as [clean_text(cell) for cell in cells], with one replace pass over the whole row."""
+    stripped = [cell.strip() for cell in cells]
+    joined = separator.join(stripped)
+    if '"' not in joined and "'" not in joined and "\t" not in joined:
+        return stripped  # Nothing to remove; strip() already returned the original strings
+
+    if separator != "," and joined.count(separator) != len(stripped) - 1:
+        return [clean_text(cell) for cell in stripped]  # Separator occurs inside a cell
+
+    return joined.replace('"', '').replace("'", "").replace("\t", " ").split(separator)
+
+def iter_clean_rows(f):
+    """Yield rows of a CSV text stream with every cell already passed through clean_text.
+
+    Equivalent to [clean_text(cell) for cell in row] over csv.reader(f), but lines
+    without a double quote (nearly all value rows) are split on commas directly.
+    Lines with quotes are handed to a single csv.reader, which also pulls in the
+    continuation lines of quoted multi-line cells.
+    """
+    pending = collections.deque()
+
+    def quoted_lines():
+        while True:
+            line = pending.popleft() if pending else next(f, None)  # Continuations come from f
+            if line is None:
+                return
+            yield line
+
+    reader = csv.reader(quoted_lines())
+
+    for line in f:
+        if '"' in line:
+            pending.append(line)
+            yield clean_row(next(reader, []))
+            continue
+
+        if line.endswith("\n"):
+            line = line[:-1]
+        if not line:
+            yield []
+        elif "'" in line or "\t" in line:
+            yield clean_row(line.split(","), ",")  # Split cells cannot contain commas
+        else:
+            yield [cell.strip() for cell in line.split(",")]
+
+def iter_csv_events(file_path):
+    """Stream a CSV as (kind, section, row) events, kind being "parameters" or "values".
+
+    Rows are not retained, so memory stays flat regardless of file size. file_path
+    may also be a (zip_path, member_chain) source from list_zip_csvs.
+    """
     current_section = None
     parameter_mode = False  # Track if we are in parameter mode
 
-    with open(file_path, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
+    with open_csv_source(file_path) as f:
         buffer = []  # Buffer for multi-line section names
 
-        for row in reader:
+        for row in iter_clean_rows(f):
             if not row:
                 continue  # Skip empty rows
 
-            row = [clean_text(cell) for cell in row]
-
             if row[0].startswith("@"):  # Section Name
                 if buffer:
                     current_section = clean_text("".join(buffer))  # Join multi-line section name
@@ -40,83 +188,686 @@ def parse_csv(file_path):
 
                 parameter_mode = True  # Next line should contain parameters
             elif parameter_mode:  # Parameter Line
-                sections[current_section]["parameters"].update(row)
+                yield "parameters", current_section, [sys.intern(param) for param in row]
                 parameter_mode = False  # Switch to value mode
             else:  # Values, ensure they are stored separately
-                sections[current_section]["values"].append(row)
+                yield "values", current_section, row
 
         # Handle last buffered section name
         if buffer:
             current_section = clean_text("".join(buffer))
-            sections[current_section]["parameters"].update(row)
+            yield "parameters", current_section, row
+
+def parse_csv(file_path, keep_values=False, values_spill=None):
+    """Parse CSV handling multi-line sections, correct parameter-value separation.
+
+    Value rows are dropped unless keep_values is set; with values_spill (a text
+    stream) they are written there as [section, *values] CSV rows instead.
+    """
+    sections = collections.defaultdict(lambda: {"parameters": set(), "values": []})
+    spill = csv.writer(values_spill) if values_spill is not None else None
+
+    for kind, section, row in iter_csv_events(file_path):
+        entry = sections[section]
+        if kind == "parameters":
+            entry["parameters"].update(row)
+        else:
+            if keep_values:
+                entry["values"].append(row)
+            if spill is not None:
+                spill.writerow([section] + row)
 
     return sections
 
-def process_operator(operator_dir):
-    """Process all CSVs for a given operator."""
-    section_counts = collections.defaultdict(int)
-    templates = collections.defaultdict(lambda: collections.defaultdict(set))
-    csv_param_sets = {}
+def build_partial(events):
+    """Fold (kind, section, row) events into (first_section, {section: parameters})."""
+    section_params = {}
+    for kind, section, row in events:
+        params = section_params.setdefault(section, set())
+        if kind == "parameters":
+            params.update(row)
+
+    if not section_params:
+        return None, {}
+
+    return next(iter(section_params)), section_params
+
+def parse_csv_partial(source):
+    """Parse one CSV into a picklable partial result: (first_section, {section: parameters})."""
+    return build_partial(iter_csv_events(source))
+
+# A run of lines that are each a complete CSV record (no quoted cell left open at the line
+# end) with no "@" anywhere. A quoted cell closes at the first quote not doubled, and any
+# text after it up to the comma belongs to the same cell, as in csv.reader.
+PLAIN_FIELD = rb'(?:"(?:[^"@\r\n]|"")*"(?!")[^,@\r\n]*|[^",@\r\n][^,@\r\n]*|)'
+PLAIN_VALUE_LINES = re.compile(rb'(?:' + PLAIN_FIELD + rb'(?:,' + PLAIN_FIELD + rb')*(?:\r\n|\n|\r))*')
+
+def line_bounds(data, pos, size):
+    """(end of line content, start of next line) in a byte buffer, with universal newlines."""
+    newline = data.find(b"\n", pos)
+    carriage = data.find(b"\r", pos, size if newline == -1 else newline)
+    if carriage != -1:
+        return carriage, carriage + 2 if data[carriage + 1:carriage + 2] == b"\n" else carriage + 1
+    if newline == -1:
+        return size, size
+    return newline, newline + 1
+
+def clean_line(line):
+    """Clean one unquoted line (without its newline) like iter_clean_rows does."""
+    if not line:
+        return []
+    if "'" in line or "\t" in line:
+        return clean_row(line.split(","), ",")
+    return [cell.strip() for cell in line.split(",")]
+
+def scan_sections(data):
+    """Build a parse_csv_partial result from a CSV held in a byte buffer (bytes or mmap).
+
+    Only section header lines and the parameter line after each header are decoded
+    and tokenized. Once the current section has been recorded, value lines cannot
+    change the result, so a single regex match skips every following line that is
+    a complete CSV record without "@"; only the line after them (a possible header,
+    or a quoted cell spanning lines) goes through the tokenizer. Skipped lines are
+    not decoded, so invalid UTF-8 there is not reported as parse_csv_partial would.
+    """
+    size = len(data)
+    section_params = {}
+    current_section = None
+    parameter_mode = False  # Next non-empty row is the parameter line
+    pos = 0
+
+    def read_row(start):
+        end, next_start = line_bounds(data, start, size)
+        if data.find(b'"', start, end) == -1:
+            return clean_line(data[start:end].decode("utf-8")), next_start
+
+        position = start
+
+        def lines():  # Feeds csv.reader the continuation lines of quoted multi-line cells
+            nonlocal position
+            while position < size:
+                end, next_start = line_bounds(data, position, size)
+                line = data[position:end].decode("utf-8") + ("\n" if next_start > end else "")
+                position = next_start
+                yield line
+
+        row = next(csv.reader(lines()), [])
+        return clean_row(row), position
+
+    while pos < size:
+        if not parameter_mode and current_section in section_params:
+            pos = PLAIN_VALUE_LINES.match(data, pos).end()  # Skipped in C, never decoded
+            if pos >= size:
+                break
+
+        row, pos = read_row(pos)
+        if not row:
+            continue  # Skip empty rows
+
+        if row[0].startswith("@"):  # Section Name
+            current_section = row[0]
+            parameter_mode = True
+        elif parameter_mode:  # Parameter Line
+            section_params.setdefault(current_section, set()).update(sys.intern(param) for param in row)
+            parameter_mode = False
+        else:  # Values only matter for creating the section entry
+            section_params.setdefault(current_section, set())
+
+    if not section_params:
+        return None, {}
+
+    return next(iter(section_params)), section_params
+
+def scan_csv_partial(source):
+    """Same result as parse_csv_partial, from a memory-mapped scan that skips value rows."""
+    if isinstance(source, bytes):
+        return scan_sections(source)
+
+    if isinstance(source, str):
+        if os.path.getsize(source) == 0:
+            return None, {}  # Empty files cannot be mapped
+        with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_sections(data)
+
+    with open_source_bytes(source) as f:  # ZIP members are decompressed into memory
+        return scan_sections(f.read())
+
+def source_size(source):
+    """Uncompressed size in bytes of a loose CSV or ZIP member source."""
+    if isinstance(source, str):
+        return os.path.getsize(source)
+
+    zip_path, members = source
+    with open_archive(zip_path, members[:-1]) as archive:
+        return archive.getinfo(members[-1]).file_size
+
+def source_digest(source):
+    """Return (content hash, size in bytes) of a loose CSV or ZIP member."""
+    digest = hashlib.blake2b(digest_size=16)
+    size = 0
+    with open_source_bytes(source) as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def parse_csv_partial_measured(source, parse=None):
+    """parse_csv_partial plus per-file stats: seconds, bytes, rows, cells, sections, parameters.
+
+    With another parse function (e.g. scan_csv_partial) that one is timed instead
+    and rows and cells are not counted.
+    """
+    counts = {"rows": 0, "cells": 0}
+
+    def counted(events):
+        for event in events:
+            counts["rows"] += 1
+            counts["cells"] += len(event[2])
+            yield event
+
+    start = time.perf_counter()
+    if parse is None or parse is parse_csv_partial:
+        partial = build_partial(counted(iter_csv_events(source)))
+    else:
+        partial = parse(source)
+    stats = {
+        "seconds": time.perf_counter() - start,
+        "bytes": source_size(source),
+        **counts,
+        "sections": len(partial[1]),
+        "parameters": sum(len(params) for params in partial[1].values()),
+    }
+    return partial, stats
+
+def collect_operator_csvs(operator_dir):
+    """Walk an operator directory and list its CSVs, including ZIP members, in walk order."""
+    csv_files = []
 
     for root, _, files in os.walk(operator_dir):
         for file in files:
             file_path = os.path.join(root, file)
 
             if file.endswith(".zip"):
-                extract_to = os.path.join(root, file.replace(".zip", ""))
-                extract_zip(file_path, extract_to)
-            
+                csv_files.extend(list_zip_csvs(file_path))  # Read in place, no extraction
+
             elif file.endswith(".csv"):
-                sections = parse_csv(file_path)
+                csv_files.append((file, file_path))
+
+    return csv_files
+
+def source_name(operator_path, source):
+    """Path of a CSV relative to its operator directory, e.g. r1/dump.csv or a.zip!inner.zip/x.csv.
+
+    Unlike the bare file name it is unique within the operator.
+    """
+    return os.path.relpath(source_cache_key(source)[0], os.path.abspath(operator_path))
+
+def in_shard(operator_path, source, shard):
+    """True if a CSV belongs to shard (index, count); files are spread by a stable path hash."""
+    index, count = shard
+    key = source_name(operator_path, source)
+    digest = hashlib.blake2b(f"{os.path.basename(operator_path)}/{key}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big") % count == index
 
-                if sections:
-                    first_section = next(iter(sections))
-                    section_counts[first_section] += 1
+def map_partials(sources, executor=None, chunksize=1, measure=False, parse=None, window=8):
+    """Lazily parse CSVs serially or in a process pool; results come back in input order.
 
-                    csv_params = set()
-                    for sec, data in sections.items():
-                        templates[sec]["parameters"].update(data["parameters"])
-                        csv_params.update(data["parameters"])
+    parse is the parser strategy (parse_csv_partial by default, or e.g.
+    scan_csv_partial); with measure, each result is a (partial, stats) pair from
+    parse_csv_partial_measured. The pool is fed at most window chunks ahead of
+    the consumer (see Helpers.bounded_map).
+    """
+    parse = parse or parse_csv_partial
+    if measure:
+        parse = functools.partial(parse_csv_partial_measured, parse=parse)
+    if executor is None:
+        return map(parse, sources)
+
+    return bounded_map(executor, parse, sources, chunksize, window)
+
+def reduce_partials(csv_files, partials):
+    """Fold per-CSV partials into section counts, templates and per-CSV parameter sets."""
+    section_counts = collections.defaultdict(int)
+    templates = collections.defaultdict(lambda: collections.defaultdict(set))
+    csv_param_sets = {}
 
-                    csv_param_sets[file] = csv_params  # Store params per CSV
+    for (file, _), (first_section, section_params) in zip(csv_files, partials):
+        if not section_params:  # Empty CSV; rows before the first header still count as section None
+            continue
+
+        section_counts[first_section] += 1
+
+        csv_params = set()
+        for sec, params in section_params.items():
+            templates[sec]["parameters"].update(params)
+            csv_params.update(params)
+
+        csv_param_sets[file] = csv_params  # Store params per CSV
 
     return section_counts, templates, csv_param_sets
 
+def open_parse_cache(cache_path):
+    """Open (or create) the on-disk cache of per-CSV partials."""
+    cache = sqlite3.connect(cache_path)
+    if cache.execute("PRAGMA user_version").fetchone()[0] != PARSE_CACHE_VERSION:
+        cache.execute("DROP TABLE IF EXISTS partials")
+        cache.execute(f"PRAGMA user_version = {PARSE_CACHE_VERSION}")
+
+    cache.execute(  # One entry per source and parse function, so parsers never read each other's partials
+        "CREATE TABLE IF NOT EXISTS partials ("
+        "key TEXT, parser TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT, "
+        "payload BLOB, nbytes INTEGER, last_used REAL, PRIMARY KEY (key, parser))"
+    )
+    cache.execute(  # Content hashes for dedup, valid while the container's size and mtime are unchanged
+        "CREATE TABLE IF NOT EXISTS digests ("
+        "key TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT, nbytes INTEGER)"
+    )
+    return cache
+
+def source_cache_key(source):
+    """Return (cache key, path on disk) for a loose CSV or a ZIP member source."""
+    if isinstance(source, str):
+        return os.path.abspath(source), source
+
+    zip_path, members = source
+    return os.path.abspath(zip_path) + "!" + "/".join(members), zip_path
+
+def file_digest(path):
+    """Hash file contents in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_parser_name(parse=None):
+    """Name a parse function's entries in the parse cache; None is parse_csv_partial."""
+    return "parse_csv_partial" if parse is None else parse.__name__
+
+def lookup_cached_partials(cache, sources, use_hash=False, parser="parse_csv_partial"):
+    """Split sources into cached partials and stale entries that need parsing.
+
+    An entry is fresh when it was written by the same parser and size and mtime
+    match; with use_hash, a changed mtime is forgiven if the content hash still matches.
+    """
+    now = time.time()
+    partials = [None] * len(sources)
+    stale = []  # (index, key, size, mtime_ns, digest)
+    digests = {}  # One hash per container, shared by ZIP members
+    touched = []
+
+    for index, source in enumerate(sources):
+        key, path = source_cache_key(source)
+        stat = os.stat(path)
+        digest = None
+
+        row = cache.execute(
+            "SELECT size, mtime_ns, digest, payload FROM partials WHERE key = ? AND parser = ?", (key, parser)
+        ).fetchone()
+
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            partials[index] = pickle.loads(row[3])
+            touched.append((now, row[2], stat.st_mtime_ns, key, parser))
+            continue
+
+        if use_hash:
+            if path not in digests:
+                digests[path] = file_digest(path)
+            digest = digests[path]
+
+            if row and row[0] == stat.st_size and row[2] == digest:
+                partials[index] = pickle.loads(row[3])
+                touched.append((now, digest, stat.st_mtime_ns, key, parser))
+                continue
+
+        stale.append((index, key, stat.st_size, stat.st_mtime_ns, digest))
+
+    cache.executemany(
+        "UPDATE partials SET last_used = ?, digest = ?, mtime_ns = ? WHERE key = ? AND parser = ?", touched
+    )
+    return partials, stale
+
+def store_cached_partials(cache, entries, parser="parse_csv_partial"):
+    """Insert or replace (key, size, mtime_ns, digest, partial) entries written by parser."""
+    now = time.time()
+    rows = []
+    for key, size, mtime_ns, digest, partial in entries:
+        payload = pickle.dumps(partial, protocol=pickle.HIGHEST_PROTOCOL)
+        rows.append((key, parser, size, mtime_ns, digest, payload, len(payload), now))
+
+    cache.executemany("INSERT OR REPLACE INTO partials VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+def evict_parse_cache(cache, max_bytes=PARSE_CACHE_MAX_BYTES):
+    """Drop least recently used entries until the cached payloads fit in max_bytes."""
+    total = cache.execute("SELECT COALESCE(SUM(nbytes), 0) FROM partials").fetchone()[0]
+    if total <= max_bytes:
+        return
+
+    evicted = []
+    for key, parser, nbytes in cache.execute("SELECT key, parser, nbytes FROM partials ORDER BY last_used"):
+        if total <= max_bytes:
+            break
+        evicted.append((key, parser))
+        total -= nbytes
+
+    cache.executemany("DELETE FROM partials WHERE key = ? AND parser = ?", evicted)
+
+def iter_parsed(sources, executor=None, chunksize=1, cache=None, cache_hash=False, measure=False, parse=None,
+                window=8):
+    """Lazily yield (partial, stats) for sources in input order; with a cache only new or changed CSVs are parsed.
+
+    stats comes from parse_csv_partial_measured with measure and is None otherwise
+    or for cache hits. With a cache, sources are looked up, parsed and stored
+    PARSE_CACHE_BLOCK at a time, so at most one block of partials is held here.
+    """
+    if cache is None:
+        parsed = map_partials(sources, executor, chunksize, measure, parse, window)
+        yield from parsed if measure else ((partial, None) for partial in parsed)
+        return
+
+    parser = cache_parser_name(parse)
+    parsed_count = 0
+    for start in range(0, len(sources), PARSE_CACHE_BLOCK):
+        block = sources[start:start + PARSE_CACHE_BLOCK]
+        partials, stale = lookup_cached_partials(cache, block, cache_hash, parser)
+        parsed = list(map_partials([block[entry[0]] for entry in stale], executor, chunksize, measure, parse, window))
+
+        stats_by_index = [None] * len(block)
+        if measure:
+            for (index, *_), (_, stats) in zip(stale, parsed):
+                stats_by_index[index] = stats
+            parsed = [partial for partial, _ in parsed]
+
+        for (index, *_), partial in zip(stale, parsed):
+            partials[index] = partial
+
+        store_cached_partials(cache, [(*entry[1:], partial) for entry, partial in zip(stale, parsed)], parser)
+        cache.commit()
+        parsed_count += len(stale)
+        del parsed
+        yield from zip(partials, stats_by_index)
+
+    if parsed_count:
+        print(f"Parsed {parsed_count} new or changed CSVs, {len(sources) - parsed_count} from cache")
+
+def parse_sources(sources, executor=None, chunksize=1, cache=None, cache_hash=False, file_stats=None,
+                  parse=None):
+    """Lazily yield partials for sources in input order; with a cache only new or changed CSVs are parsed.
+
+    If file_stats is a list, each source's parse stats (None for cache hits) are
+    appended to it as its partial is yielded.
+    """
+    for partial, stats in iter_parsed(sources, executor, chunksize, cache, cache_hash, file_stats is not None, parse):
+        if file_stats is not None:
+            file_stats.append(stats)
+        yield partial
+
+def lookup_cached_digests(cache, sources):
+    """Split sources into cached (digest, size) pairs and stale entries that need hashing."""
+    digests = [None] * len(sources)
+    stale = []  # (index, key, size, mtime_ns)
+
+    for index, source in enumerate(sources):
+        key, path = source_cache_key(source)
+        stat = os.stat(path)
+        row = cache.execute("SELECT size, mtime_ns, digest, nbytes FROM digests WHERE key = ?", (key,)).fetchone()
+
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            digests[index] = (row[2], row[3])
+        else:
+            stale.append((index, key, stat.st_size, stat.st_mtime_ns))
+
+    return digests, stale
+
+def find_duplicates(sources, executor=None, chunksize=1, cache=None):
+    """Hash every source and group identical payloads.
+
+    Returns (representatives, groups): representatives[i] is the index of the first
+    source with the same content as source i, and groups maps each digest seen more
+    than once to (size, [source indexes]). With a parse cache, sources whose size and
+    mtime are unchanged since the last run reuse their stored hash instead of being read.
+    """
+    if cache is None:
+        digests, stale = [None] * len(sources), [(index,) for index in range(len(sources))]
+    else:
+        digests, stale = lookup_cached_digests(cache, sources)
+
+    stale_sources = [sources[entry[0]] for entry in stale]
+    if executor is None:
+        hashed = list(map(source_digest, stale_sources))
+    else:
+        hashed = list(executor.map(source_digest, stale_sources, chunksize=chunksize))
+
+    for (index, *_), digest in zip(stale, hashed):
+        digests[index] = digest
+
+    if cache is not None:
+        cache.executemany(
+            "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)",
+            [(key, size, mtime_ns, digest, nbytes) for (_, key, size, mtime_ns), (digest, nbytes) in zip(stale, hashed)],
+        )
+        cache.commit()
+
+    first_seen = {}
+    representatives = []
+    groups = {}
+    for index, (digest, size) in enumerate(digests):
+        representative = first_seen.setdefault(digest, index)
+        representatives.append(representative)
+        if representative != index:
+            groups.setdefault(digest, (size, [representative]))[1].append(index)
+
+    return representatives, groups
+
+def parse_deduplicated(sources, representatives, executor=None, chunksize=1, cache=None, cache_hash=False,
+                       measure=False, parse=None, window=8):
+    """iter_parsed for the first copy of each payload; duplicates reuse its partial.
+
+    A partial is only kept until the last copy of its payload has been yielded.
+    Stats of duplicates are None, as for cache hits.
+    """
+    unique = [index for index, representative in enumerate(representatives) if representative == index]
+    last_copy = {}
+    for index, representative in enumerate(representatives):
+        if representative != index:
+            last_copy[representative] = index
+
+    parsed = iter_parsed([sources[index] for index in unique], executor, chunksize, cache, cache_hash, measure,
+                         parse, window)
+    kept = {}  # Representative -> partial, while copies are still to come
+
+    for index, representative in enumerate(representatives):
+        if representative == index:
+            partial, stats = next(parsed)
+            if index in last_copy:
+                kept[index] = partial
+            yield partial, stats
+        elif last_copy[representative] == index:
+            yield kept.pop(representative), None
+        else:
+            yield kept[representative], None
+
+    next(parsed, None)  # Let iter_parsed finish (and print its cache summary)
+
+def save_duplicate_report(names, groups, file_path):
+    """Write duplicate groups (largest savings first) and the bytes saved by parsing each payload once."""
+    ranked = sorted(groups.items(), key=lambda item: item[1][0] * (len(item[1][1]) - 1), reverse=True)
+    copies = sum(len(indexes) - 1 for _, indexes in groups.values())
+    saved = sum(size * (len(indexes) - 1) for size, indexes in groups.values())
+
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"Duplicate groups: {len(groups)}, duplicate copies: {copies}, bytes saved: {saved}\n")
+        for digest, (size, indexes) in ranked:
+            f.write(f"\n{digest} ({size} bytes, {len(indexes)} copies)\n")
+            for index in indexes:
+                f.write(f"  {names[index]}\n")
+
+    print(f"Duplicate CSVs: {copies} copies in {len(groups)} groups, {saved / 1e6:.1f} MB not re-parsed")
+    print(f"Duplicate report saved: {file_path}")
+
+def process_operator(operator_dir, executor=None, cache=None, prevalence=None):
+    """Process all CSVs for a given operator, optionally parsing them in a process pool.
+
+    With a Prevalence.new_counter() as prevalence, parameter frequencies are
+    counted from the same partials.
+    """
+    csv_files = collect_operator_csvs(operator_dir)
+    partials = list(parse_sources([source for _, source in csv_files], executor, cache=cache))
+    if prevalence is not None:
+        import Prevalence
+        Prevalence.add_partials(prevalence, partials)
+    return reduce_partials(csv_files, partials)
+
 def merge_templates(templates):
     """Merge all section structures into a master template."""
     return {section: sorted(data["parameters"]) for section, data in templates.items()}
 
+def write_template_file(file_path, template):
+    """Write a template TXT file atomically, so readers never see a half-written file."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for section, params in template.items():
+            f.write(f"{section}\n")
+            f.write(", ".join(params) + "\n\n")
+    os.replace(tmp_path, file_path)
+
 def save_master_template(operator, template, output_dir):
     """Save master template as a TXT file."""
     os.makedirs(output_dir, exist_ok=True)
     file_path = os.path.join(output_dir, f"master_template_{operator}.txt")
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        for section, params in template.items():
-            f.write(f"{section}\n")
-            f.write(", ".join(params) + "\n\n")
+    write_template_file(file_path, template)
 
     print(f"Master template saved: {file_path}")
 
-def process_all_operators(base_directory, output_dir):
-    """Process each operator and generate master templates."""
-    operator_master_templates = {}
-    operator_section_counts = {}
-    operator_param_sets = {}
+def open_columnar_export(operator, operator_path, export_dir, batch_rows=EXPORT_BATCH_ROWS):
+    """Start one operator's dictionary-encoded Parquet file under operator=<name>/; feed it with export_events."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    strings = pa.dictionary(pa.int32(), pa.string())
+    schema = pa.schema([
+        ("file", strings), ("section", strings), ("parameter", strings),
+        ("row", pa.int64()), ("value", strings),
+    ])
+
+    partition_dir = os.path.join(export_dir, f"operator={operator}")
+    os.makedirs(partition_dir, exist_ok=True)
+    file_path = os.path.join(partition_dir, "part-0.parquet")
+    return {
+        "path": file_path,
+        "operator_path": operator_path,
+        "schema": schema,
+        "writer": pq.ParquetWriter(file_path, schema),
+        "columns": {name: [] for name in schema.names},
+        "batch_rows": batch_rows,
+    }
+
+def flush_columnar_export(export):
+    """Write the buffered value cells as one row group."""
+    import pyarrow as pa
+
+    columns, schema = export["columns"], export["schema"]
+    if columns["value"]:
+        arrays = [pa.array(columns[name], field.type) for name, field in zip(schema.names, schema)]
+        export["writer"].write_table(pa.Table.from_arrays(arrays, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+def export_events(export, source, events):
+    """Pass one CSV's (kind, section, row) events through, buffering its value cells for the export.
+
+    Each value is paired with the parameter at the same position in its section's
+    parameter line; cells beyond the parameter line get a null parameter. The file
+    column holds source_name (e.g. sub/f0.csv or a.zip!inner.zip/x.csv), as in the
+    parameter index, so same-named CSVs stay apart.
+    """
+    file = source_name(export["operator_path"], source)
+    columns = export["columns"]
+    parameters = {}
+    row_index = 0
+
+    for event in events:
+        yield event
+        kind, section, row = event
+        if kind == "parameters":
+            parameters[section] = row
+            continue
+
+        names = parameters.get(section, ())
+        for position, value in enumerate(row):
+            columns["file"].append(file)
+            columns["section"].append(section)
+            columns["parameter"].append(names[position] if position < len(names) else None)
+            columns["row"].append(row_index)
+            columns["value"].append(value)
+        row_index += 1
+
+        if len(columns["value"]) >= export["batch_rows"]:
+            flush_columnar_export(export)
+
+def close_columnar_export(export):
+    """Flush the last row group and close the operator's Parquet file; returns its path."""
+    flush_columnar_export(export)
+    export["writer"].close()
+    return export["path"]
+
+def process_all_operators(base_directory, output_dir, workers=1, cache_path=None,
+                          cache_hash=False, cache_max_bytes=PARSE_CACHE_MAX_BYTES, export_dir=None,
+                          index_path=None, metrics=None, compact=False, shard=None, dedup=None,
+                          value_stats=False, near_common_threshold=None, prevalence_sketch=None, top_k=100,
+                          scan=False):
+    """Process each operator and generate master templates.
 
-    for operator in os.listdir(base_directory):
-        operator_path = os.path.join(base_directory, operator)
-        if os.path.isdir(operator_path):
-            print(f"Processing Operator: {operator}")
+    With workers > 1 the CSVs of every operator are parsed in one shared process
+    pool; partials are reduced in walk order, so output matches a serial run.
+    With cache_path, partials persist between runs and only new or changed CSVs
+    are parsed again. With export_dir, parsed values are also written as a
+    columnar dataset (see open_columnar_export). With index_path, a parameter ->
+    section -> operator -> file index is saved for Paramindex queries. With a
+    Metrics.new_metrics() collector, stage timings, counters and slowest files
+    and operators are recorded into it. With compact, templates and per-CSV
+    parameter sets are kept as interned ID arrays (see Compactstore) instead of
+    sets of strings.
+    With shard=(index, count), only this node's hash share of a tree every node
+    can see is processed; with shard="local", the node's own local tree is
+    processed whole. Either way no master template files are written: save the
+    results with Shards.save_shard and combine them with Shards.py.
+    With dedup, CSVs are content-hashed and each distinct payload is parsed once:
+    "count" still counts every copy in the statistics, "once" counts identical
+    CSVs once per operator. Duplicate groups are listed in duplicate_report.txt.
+    With value_stats, per section parameter value profiles (type, null rate,
+    cardinality, min/max) are written to value_stats.csv (see Valuestats).
+    With near_common_threshold, parameter prevalence is counted while reducing:
+    top_k tables and near-common templates (parameters in at least that share
+    of a section's files) are saved per operator and globally (see Prevalence).
+    prevalence_sketch=(width, depth, capacity) bounds their memory with a
+    Count-Min sketch. With scan, templates are built by scan_csv_partial, which
+    only tokenizes section headers and parameter lines.
 
-            section_counts, templates, csv_param_sets = process_operator(operator_path)
-            operator_master_templates[operator] = merge_templates(templates)
-            operator_section_counts[operator] = section_counts
-            operator_param_sets[operator] = csv_param_sets
+    Runs on Pipeline.run_pipeline with the count, template and param_sets stages
+    plus one stage per option (index, prevalence, export, value_stats), so the
+    global master template is saved as well (except in shard mode). Returns
+    (operator_templates, operator_section_counts, operator_param_sets); per-CSV
+    parameter sets are keyed by the CSV's path within its operator (source_name).
+    """
+    import Pipeline  # Imports this module, so not at the top
 
-            save_master_template(operator, operator_master_templates[operator], output_dir)
+    stages = ["count", "template", "param_sets"]
+    if index_path is not None:
+        stages.append("index")
+    if near_common_threshold is not None:
+        stages.append("prevalence")
+    if export_dir is not None:
+        stages.append("export")
+    if value_stats:
+        stages.append("value_stats")
 
-    return operator_master_templates, operator_section_counts, operator_param_sets
+    results = Pipeline.run_pipeline(
+        base_directory, output_dir, "scan" if scan else "sections", stages, workers, cache_path, cache_hash,
+        cache_max_bytes, dedup, index_path=index_path, export_dir=export_dir, metrics=metrics, compact=compact,
+        shard=shard, near_common_threshold=near_common_threshold, prevalence_sketch=prevalence_sketch, top_k=top_k,
+    )
+    return results["template"]["operators"], results["count"], results["param_sets"]
 
 def merge_global_master(operators_templates):
     """Combine all operator templates into a single global master template."""
@@ -131,24 +882,34 @@ def merge_global_master(operators_templates):
 def save_global_master_template(global_template, output_dir):
     """Save the global master template as a TXT file."""
     file_path = os.path.join(output_dir, "global_master_template.txt")
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        for section, params in global_template.items():
-            f.write(f"{section}\n")
-            f.write(", ".join(params) + "\n\n")
+    write_template_file(file_path, global_template)
 
     print(f"Global master template saved: {file_path}")
 
-def analyze_common_parameters(operator_param_sets):
-    """Analyze and visualize common parameters within each operator and across operators."""
+def overlap_matrix(matrix):
+    """Pairwise intersection sizes of encoded sets, computed as a single matrix product."""
+    import numpy as np
+
+    counts = matrix.astype(np.float32)  # BLAS path; exact while a set has < 2**24 parameters
+    return (counts @ counts.T).astype(np.int64)
+
+def analyze_common_parameters(operator_param_sets, figure_dir=None, plot=True):
+    """Analyze and visualize common parameters within each operator and across operators.
+
+    Heatmaps are written to figure_dir when given instead of being shown; with
+    plot False only the text analysis is printed (see Reports for batch rendering).
+    """
+    if plot:
+        plt, sns = load_plotting(headless=figure_dir is not None)
     operator_common_params = {}
     global_param_sets = []
 
     for operator, csv_param_sets in operator_param_sets.items():
         if csv_param_sets:
-            common_params = set.intersection(*csv_param_sets.values())
+            csv_matrix, csv_vocabulary = param_set_matrix(csv_param_sets)
+            common_params = set(csv_vocabulary[csv_matrix.all(axis=0)])
             operator_common_params[operator] = common_params
-            global_param_sets.append(set.union(*csv_param_sets.values()))
+            global_param_sets.append(set(csv_vocabulary[csv_matrix.any(axis=0)]))
 
             print(f"\nOperator: {operator}")
             print("Total Parameters per CSV:")
@@ -156,40 +917,79 @@ def analyze_common_parameters(operator_param_sets):
                 print(f"{csv_file}: {len(param_set)}")
 
             print(f"Common Parameters in all CSVs: {len(common_params)}\n")
+            if not plot:
+                continue
 
             # Heatmap with CSV labels
             plt.figure(figsize=(8, 6))
             csv_files = list(csv_param_sets.keys())
-            param_matrix = [[len(csv_param_sets[f1] & csv_param_sets[f2]) for f2 in csv_files] for f1 in csv_files]
+            param_matrix = overlap_matrix(csv_matrix)
             sns.heatmap(param_matrix, annot=True, cmap="Blues", xticklabels=csv_files, yticklabels=csv_files)
             plt.title(f"Parameter Similarity Heatmap - {operator}")
             plt.xlabel("CSV Files")
             plt.ylabel("CSV Files")
-            plt.show()
+            finish_figure(plt, figure_dir, f"parameter_similarity_{operator}")
 
-    global_common_params = set.intersection(*global_param_sets) if global_param_sets else set()
+    global_matrix, global_vocabulary = encode_param_sets(global_param_sets)
+    global_common_params = set(global_vocabulary[global_matrix.all(axis=0)]) if global_param_sets else set()
     print("\n### Global Common Parameters Across All Operators ###")
     print("Total Unique Parameters Per Operator:")
     for operator, param_set in operator_common_params.items():
         print(f"{operator}: {len(param_set)}")
 
     print(f"Common Parameters Across Operators: {len(global_common_params)}")
+    if not plot:
+        return
 
     # Heatmap for parameter overlap across operators
     plt.figure(figsize=(8, 6))
     operator_list = list(operator_common_params.keys())
-    param_matrix = [[len(operator_common_params[o1] & operator_common_params[o2]) for o2 in operator_list] for o1 in operator_list]
+    param_matrix = overlap_matrix(encode_param_sets([operator_common_params[o] for o in operator_list])[0])
     sns.heatmap(param_matrix, annot=True, cmap="Greens", xticklabels=operator_list, yticklabels=operator_list)
     plt.title("Operator-Wise Parameter Overlap Heatmap")
     plt.xlabel("Operators")
     plt.ylabel("Operators")
-    plt.show()
+    finish_figure(plt, figure_dir, "operator_parameter_overlap")
+
+def analyze_template_families(operator_param_sets, threshold=0.8, num_perm=128, sample_size=2000):
+    """Cluster each operator's CSVs into parameter-set families with MinHash LSH.
+
+    Approximate alternative to the full overlap heatmap for very large operators;
+    accuracy is reported against exact Jaccard on a sample of the CSVs.
+    """
+    import Minhash
+
+    for operator, csv_param_sets in operator_param_sets.items():
+        if not csv_param_sets:
+            continue
+
+        csv_files = list(csv_param_sets.keys())
+        param_sets = list(csv_param_sets.values())
+        index = Minhash.build_similarity_index(param_sets, threshold, num_perm)
+        families = Minhash.cluster_families(index)
+
+        print(f"\nOperator: {operator}")
+        print(f"Template Families (Jaccard >= {threshold}): {len(families)}")
+        for family in families:
+            if len(family) > 1:
+                print(f"  {len(family)} CSVs, e.g. {', '.join(csv_files[i] for i in family[:3])}")
+
+        accuracy = Minhash.evaluate_against_exact(param_sets, threshold, num_perm, sample_size=sample_size)
+        print("Accuracy vs exact Jaccard:", ", ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in accuracy.items()
+        ))
+
+def analyze_section_distribution(operator_section_counts, figure_dir=None, plot=True):
+    """Display section type distribution across operators; with plot False only the table is printed."""
+    import pandas as pd
 
-def analyze_section_distribution(operator_section_counts):
-    """Display section type distribution across operators."""
     section_df = pd.DataFrame(operator_section_counts).fillna(0).astype(int)
     print("\n### Section Type Distribution Across Operators ###")
     print(section_df)
+    if not plot:
+        return
+
+    plt, _ = load_plotting(headless=figure_dir is not None)
 
     # Bar plot visualization
     section_df.T.plot(kind='bar', stacked=True, figsize=(10, 6), colormap="viridis")
@@ -197,19 +997,95 @@ def analyze_section_distribution(operator_section_counts):
     plt.xlabel("Operators")
     plt.ylabel("Section Count")
     plt.legend(title="Section Type", bbox_to_anchor=(1, 1))
-    plt.show()
+    finish_figure(plt, figure_dir, "section_distribution")
 
 def main():
     base_directory = "path/to/your/directory"  # Change this
     output_dir = "path/to/output/directory"  # Change this
+    workers = os.cpu_count() or 1  # Set to 1 for a serial run
+    cache_path = os.path.join(output_dir, "parse_cache.sqlite")  # Set to None to always re-parse
+    approximate = False  # Set True to cluster CSVs with MinHash LSH instead of exact heatmaps
+    export_dir = None  # e.g. os.path.join(output_dir, "parsed_dataset") for a Parquet export
+    index_path = os.path.join(output_dir, "parameter_index.sqlite")  # Query with Paramindex.py
+    reports = True  # Set False for a template-only run that never imports pandas/matplotlib
+    figure_dir = os.path.join(output_dir, "figures")  # Rendered in parallel with report.html; None shows them interactively
+    metrics_path = None  # e.g. os.path.join(output_dir, "metrics.json") for stage timings and counters
+    profile_path = None  # e.g. os.path.join(output_dir, "run.pstats") to cProfile the run (use workers = 1)
+    compact = False  # Set True to keep templates and per-CSV parameter sets as interned ID arrays (less memory)
+    shard = None  # e.g. (0, 4) on the first of four nodes sharing one tree, or "local" for this node's own tree
+    shard_path = os.path.join(output_dir, "shard_result.json")  # Written instead of templates, index and reports
+    scan = True  # Memory-mapped section scanner; set False to tokenize every row with csv.reader
+    async_io = False  # Set True on network storage to overlap walking, reading and parsing (templates only)
+    value_stats = False  # Set True to profile value types, null rates and cardinality into value_stats.csv
+    near_common_threshold = None  # e.g. 0.95 for templates of parameters in >= 95% of a section's files
+    prevalence_sketch = None  # e.g. (1 << 20, 4, 1000) to count prevalence in bounded memory on huge corpora
+    snapshot_dir = None  # e.g. os.path.join(output_dir, "snapshots"); diff two runs with Templatediff.py
+    dedup = None  # "count": parse identical CSVs once but count every copy; "once": count them once per operator
+
+    if async_io:  # Asyncpipeline only builds templates, so the options below are turned off
+        ignored = {
+            "cache_path": cache_path, "export_dir": export_dir, "index_path": index_path, "compact": compact,
+            "shard": shard, "value_stats": value_stats, "near_common_threshold": near_common_threshold,
+            "dedup": dedup,
+        }
+        ignored = [name for name, value in ignored.items() if value not in (None, False)]
+        if ignored:
+            print(f"async_io only builds templates; ignoring {', '.join(ignored)}")
+        cache_path = export_dir = index_path = shard = near_common_threshold = dedup = None
+        compact = value_stats = False
+
+    import Pipeline  # Imports this module, so not at the top
+
+    stages = ["count", "template", "param_sets"]
+    if index_path is not None and shard is None:  # A shard's index would only cover its files
+        stages.append("index")
+    if near_common_threshold is not None:
+        stages.append("prevalence")
+    if export_dir is not None:
+        stages.append("export")
+    if value_stats:
+        stages.append("value_stats")
+    if shard is None:  # Global outputs are built from the merged shard files (Shards.py --output-dir)
+        if reports:
+            stages += ["families" if approximate else "overlap", "sections"]
+            if figure_dir is not None:
+                stages.append("figures")  # Rendered in parallel instead of one pyplot figure at a time
+        if snapshot_dir is not None:
+            stages.append("snapshot")
+
+    os.makedirs(output_dir, exist_ok=True)
+    metrics = Metrics.new_metrics() if metrics_path else None
+    settings = {
+        "figure_dir": figure_dir, "index_path": index_path, "export_dir": export_dir, "metrics": metrics,
+        "compact": compact, "shard": shard, "near_common_threshold": near_common_threshold,
+        "prevalence_sketch": prevalence_sketch, "snapshot_dir": snapshot_dir, "show_figures": figure_dir is None,
+    }
 
-    operator_templates, operator_counts, operator_param_sets = process_all_operators(base_directory, output_dir)
+    with Metrics.profiled(profile_path):
+        if async_io:
+            import Asyncpipeline
+            with Metrics.stage(metrics, "pipeline"):
+                operator_templates, operator_counts, operator_param_sets = \
+                    Asyncpipeline.process_all_operators_async(base_directory, output_dir, workers)
+            operator_results = {"count": operator_counts, "template": operator_templates,
+                                "param_sets": operator_param_sets}
+            context = Pipeline.pipeline_context(base_directory, output_dir, workers, **settings)
+            results = Pipeline.finish_stages(stages, operator_results, context)
+        else:
+            results = Pipeline.run_pipeline(
+                base_directory, output_dir, "scan" if scan else "sections", stages, workers, cache_path,
+                dedup=dedup, **settings,
+            )
 
-    analyze_common_parameters(operator_param_sets)
-    analyze_section_distribution(operator_counts)
+        if shard is not None:
+            import Shards
+            Shards.save_shard(
+                Shards.shard_result(results["template"]["operators"], results["count"], results["param_sets"]),
+                shard_path,
+            )
 
-    global_master_template = merge_global_master(operator_templates)
-    save_global_master_template(global_master_template, output_dir)
+    if metrics is not None:
+        Metrics.save_metrics(metrics, metrics_path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+import os
+import csv
+import numpy as np
+import pandas as pd
+
+NULL_TOKENS = ["", "NULL", "null", "None", "N/A", "n/a", "NA", "-"]
+INT_PATTERN = r"[+-]?\d+"
+IP_PATTERN = (
+    r"(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)"  # IPv4
+    r"|[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){7}"  # IPv6, full form
+    r"|(?=.*::)[0-9A-Fa-f]{0,4}(?::[0-9A-Fa-f]{0,4}){2,6}"  # IPv6, compressed
+)
+SKETCH_SIZE = 1024  # Smallest distinct hashes kept per parameter; cardinality is exact below this
+ENUM_MAX = 32  # Non-numeric parameters with at most this many distinct values are enums
+BATCH_CELLS = 1 << 16  # Values buffered per section before they are profiled
+
+STAT_COLUMNS = [
+    "section", "parameter", "type", "values", "null_rate", "cardinality", "cardinality_exact",
+    "min", "max", "int", "float", "ip", "text",
+]
+
+def new_profile():
+    """Empty running profile of one section parameter."""
+    return {
+        "count": 0, "nulls": 0, "int": 0, "float": 0, "ip": 0, "text": 0,
+        "min": np.inf, "max": -np.inf,
+        "hashes": np.zeros(0, dtype=np.uint64),  # K smallest distinct value hashes
+        "distinct": set(),  # Distinct values while there are at most ENUM_MAX, else None
+    }
+
+def profile_batch(profile, values):
+    """Fold a batch of raw string values into a profile with vectorized pandas/NumPy operations."""
+    series = pd.Series(values, dtype=object)
+    nulls = series.isin(NULL_TOKENS).to_numpy()
+    present = series[~nulls]
+
+    numbers = pd.to_numeric(present, errors="coerce").to_numpy(dtype=np.float64)
+    numeric = ~np.isnan(numbers)
+    integers = present[numeric].str.fullmatch(INT_PATTERN).to_numpy(dtype=bool)
+    ips = present[~numeric].str.fullmatch(IP_PATTERN).to_numpy(dtype=bool)
+
+    profile["count"] += len(series)
+    profile["nulls"] += int(nulls.sum())
+    profile["int"] += int(integers.sum())
+    profile["float"] += int(numeric.sum() - integers.sum())
+    profile["ip"] += int(ips.sum())
+    profile["text"] += int(len(ips) - ips.sum())
+
+    finite = numbers[numeric & np.isfinite(numbers)]
+    if len(finite):
+        profile["min"] = min(profile["min"], float(finite.min()))
+        profile["max"] = max(profile["max"], float(finite.max()))
+
+    hashes = pd.util.hash_array(present.to_numpy(dtype=object))
+    profile["hashes"] = np.union1d(profile["hashes"], hashes)[:SKETCH_SIZE]  # Sorted and unique
+
+    if profile["distinct"] is not None:
+        profile["distinct"].update(pd.unique(present.to_numpy(dtype=object))[:ENUM_MAX + 1])
+        if len(profile["distinct"]) > ENUM_MAX:
+            profile["distinct"] = None
+
+def merge_profiles(left, right):
+    """Combine two profiles of the same parameter (e.g. from different operators)."""
+    merged = {name: left[name] + right[name] for name in ("count", "nulls", "int", "float", "ip", "text")}
+    merged["min"] = min(left["min"], right["min"])
+    merged["max"] = max(left["max"], right["max"])
+    merged["hashes"] = np.union1d(left["hashes"], right["hashes"])[:SKETCH_SIZE]
+    if left["distinct"] is None or right["distinct"] is None:
+        merged["distinct"] = None
+    else:
+        merged["distinct"] = left["distinct"] | right["distinct"]
+        if len(merged["distinct"]) > ENUM_MAX:
+            merged["distinct"] = None
+    return merged
+
+def cardinality(profile):
+    """(distinct value count, exact?) from the K-minimum-values sketch."""
+    hashes = profile["hashes"]
+    if len(hashes) < SKETCH_SIZE:
+        return len(hashes), True
+    return int((SKETCH_SIZE - 1) / (float(hashes[-1]) / 2.0 ** 64)), False
+
+def infer_type(profile):
+    """Column type from the per-value type counts."""
+    present = profile["count"] - profile["nulls"]
+    if present == 0:
+        return "empty"
+    if profile["int"] == present:
+        return "int"
+    if profile["int"] + profile["float"] == present:
+        return "float"
+    if profile["ip"] == present:
+        return "ip"
+    if profile["distinct"] is not None:
+        return "enum"
+    return "text"
+
+def new_value_profiler(batch_cells=BATCH_CELLS):
+    """Empty profiler for one operator's CSVs; feed it with profile_events."""
+    return {
+        "profiles": {},  # (section, parameter) -> profile
+        "buffers": {},  # section -> {parameter: [values]}
+        "buffered": {},  # section -> number of buffered values
+        "batch_cells": batch_cells,
+    }
+
+def flush_section(profiler, section):
+    """Profile and clear one section's buffered values."""
+    profiles = profiler["profiles"]
+    for parameter, values in profiler["buffers"].pop(section).items():
+        key = (section, parameter)
+        if key not in profiles:
+            profiles[key] = new_profile()
+        profile_batch(profiles[key], values)
+    profiler["buffered"][section] = 0
+
+def profile_events(profiler, events):
+    """Pass one CSV's (kind, section, row) events through, buffering its values per section parameter.
+
+    Values are paired with the parameter at the same position in the section's
+    parameter line; a section's buffer is profiled and cleared once it holds
+    batch_cells values, which bounds memory per section.
+    """
+    buffers, buffered = profiler["buffers"], profiler["buffered"]
+    parameters = {}
+
+    for event in events:
+        yield event
+        kind, section, row = event
+        if kind == "parameters":
+            parameters[section] = row
+            continue
+
+        columns = buffers.setdefault(section, {})
+        for parameter, value in zip(parameters.get(section, ()), row):  # Cells past the parameters are skipped
+            columns.setdefault(parameter, []).append(value)
+        buffered[section] = buffered.get(section, 0) + len(row)
+
+        if buffered[section] >= profiler["batch_cells"]:
+            flush_section(profiler, section)
+
+def finish_value_profiler(profiler):
+    """Profile what is still buffered and return {(section, parameter): profile}."""
+    for section in list(profiler["buffers"]):
+        flush_section(profiler, section)
+    return profiler["profiles"]
+
+def merge_operator_profiles(operator_profiles):
+    """Merge per-operator profiles into {(section, parameter): profile}."""
+    profiles = {}
+    for operator_profile in operator_profiles:
+        for key, profile in operator_profile.items():
+            profiles[key] = merge_profiles(profiles[key], profile) if key in profiles else profile
+    return profiles
+
+def save_value_stats(profiles, output_dir):
+    """Write one row per section parameter to value_stats.csv next to the master templates."""
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, "value_stats.csv")
+
+    with open(file_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(STAT_COLUMNS)
+        for (section, parameter), profile in sorted(profiles.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            distinct, exact = cardinality(profile)
+            numeric = profile["min"] <= profile["max"]
+            writer.writerow([
+                section, parameter, infer_type(profile), profile["count"],
+                f"{profile['nulls'] / profile['count']:.4f}" if profile["count"] else "",
+                distinct, exact,
+                profile["min"] if numeric else "", profile["max"] if numeric else "",
+                profile["int"], profile["float"], profile["ip"], profile["text"],
+            ])
+
+    print(f"Value statistics saved: {file_path} ({len(profiles)} section parameters)")
+    return file_path
@@ -0,0 +1,259 @@
+import os
+import csv
+import time
+import zipfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import Updatedmastertemplate as umt
+
+# Long-running mode: poll base_directory, parse only new or changed CSVs and ZIPs, and
+# keep templates up to date with reference counts so deleted files also remove parameters.
+
+PARSE_ERRORS = (OSError, UnicodeDecodeError, csv.Error, zipfile.BadZipFile)
+
+def new_watch_state():
+    """Empty watcher state: known files, ZIP listings and refcounted templates."""
+    return {
+        "files": {},  # operator -> {source key: (signature, partial)}
+        "zips": {},  # zip path -> (signature, [(name, source)])
+        "operators": {},  # operator -> refcounts, see operator_counts
+        "global_sections": {},  # section -> number of operators whose template has it
+        "global_params": {},  # section -> {parameter: number of operators whose template has it}
+    }
+
+def operator_counts(state, operator):
+    """Refcounts for one operator, created on first use."""
+    if operator not in state["operators"]:
+        state["operators"][operator] = {
+            "section_counts": {},  # first section -> number of CSVs
+            "section_files": {},  # section -> number of CSVs containing it
+            "section_params": {},  # section -> {parameter: number of CSVs using it}
+        }
+    return state["operators"][operator]
+
+def _bump(counts, key, delta):
+    """Add delta to counts[key], dropping the key at zero; return the new count."""
+    count = counts.get(key, 0) + delta
+    if count:
+        counts[key] = count
+    else:
+        del counts[key]
+    return count
+
+def apply_partial(state, operator, partial, delta):
+    """Add (delta=1) or remove (delta=-1) one CSV's partial; counts only change on 0 <-> 1 edges."""
+    first_section, section_params = partial
+    if not section_params:  # Empty CSVs are skipped by reduce_partials too
+        return
+
+    counts = operator_counts(state, operator)
+    _bump(counts["section_counts"], first_section, delta)
+
+    for section, params in section_params.items():
+        file_count = _bump(counts["section_files"], section, delta)
+        if file_count == (1 if delta > 0 else 0):  # Section appeared in or left this operator
+            _bump(state["global_sections"], section, delta)
+
+        operator_params = counts["section_params"].setdefault(section, {})
+        global_params = state["global_params"].setdefault(section, {})
+        for param in params:
+            param_count = _bump(operator_params, param, delta)
+            if param_count == (1 if delta > 0 else 0):
+                _bump(global_params, param, delta)
+
+        if not operator_params:
+            del counts["section_params"][section]
+        if not global_params:
+            del state["global_params"][section]
+
+def operator_template(state, operator):
+    """Current master template of an operator, as merge_templates would build it."""
+    counts = state["operators"].get(operator)
+    if counts is None:
+        return {}
+    return {section: sorted(counts["section_params"].get(section, ())) for section in counts["section_files"]}
+
+def global_template(state):
+    """Current global master template, as merge_global_master would build it."""
+    return {section: sorted(state["global_params"].get(section, ())) for section in state["global_sections"]}
+
+def file_signature(path):
+    """(mtime_ns, size) of a file on disk."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def list_operator_sources(state, operator_path, now, settle_seconds):
+    """List an operator's CSVs as {source key: (signature, source)}.
+
+    ZIP listings are reused while the archive is unchanged. Files modified within
+    settle_seconds are still being written: a known file keeps its old signature,
+    a new one is left for a later poll.
+    """
+    sources = {}
+    known = state["zips"]
+
+    def settled(signature):
+        return now - signature[0] / 1e9 >= settle_seconds
+
+    for root, _, files in os.walk(operator_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            try:
+                signature = file_signature(file_path)
+            except FileNotFoundError:  # Deleted between walk and stat
+                continue
+
+            if file.endswith(".zip"):
+                if file_path in known and (known[file_path][0] == signature or not settled(signature)):
+                    signature, members = known[file_path]
+                elif settled(signature):
+                    try:
+                        members = umt.list_zip_csvs(file_path)
+                    except PARSE_ERRORS as e:
+                        print(f"Skipping unreadable ZIP {file_path}: {e}")
+                        continue
+                    known[file_path] = (signature, members)
+                else:
+                    continue
+
+                for _, source in members:
+                    sources[umt.source_cache_key(source)[0]] = (signature, source)
+
+            elif file.endswith(".csv"):
+                if settled(signature):
+                    sources[umt.source_cache_key(file_path)[0]] = (signature, file_path)
+                else:
+                    sources[umt.source_cache_key(file_path)[0]] = (None, file_path)  # Resolved by caller
+
+    return sources
+
+def parse_changed(sources, executor=None):
+    """Parse sources, returning a partial or None per source; a bad file does not stop the others."""
+    if executor is None:
+        results = []
+        for source in sources:
+            try:
+                results.append(umt.parse_csv_partial(source))
+            except PARSE_ERRORS as e:
+                print(f"Skipping unreadable CSV {source}: {e}")
+                results.append(None)
+        return results
+
+    futures = [executor.submit(umt.parse_csv_partial, source) for source in sources]
+    results = []
+    for source, future in zip(sources, futures):
+        try:
+            results.append(future.result())
+        except PARSE_ERRORS as e:
+            print(f"Skipping unreadable CSV {source}: {e}")
+            results.append(None)
+    return results
+
+def flush_templates(state, operators, output_dir):
+    """Atomically rewrite the given operators' template files and the global template."""
+    for operator in operators:
+        if operator in state["files"]:
+            umt.save_master_template(operator, operator_template(state, operator), output_dir)
+        else:  # Operator directory was removed
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(output_dir, f"master_template_{operator}.txt"))
+
+    umt.save_global_master_template(global_template(state), output_dir)
+
+def poll_once(state, base_directory, output_dir, executor=None, settle_seconds=2.0):
+    """Apply all changes since the last poll and flush affected templates; return the number of changes."""
+    now = time.time()
+    operators = [
+        operator for operator in os.listdir(base_directory)
+        if os.path.isdir(os.path.join(base_directory, operator))
+    ]
+
+    removed = []  # (operator, key)
+    changed = []  # (operator, key, signature, source)
+    dirty = set()
+
+    for operator in set(state["files"]) - set(operators):
+        removed.extend((operator, key) for key in state["files"][operator])
+        dirty.add(operator)
+
+    for operator in operators:
+        known = state["files"].get(operator, {})
+        if operator not in state["files"]:
+            dirty.add(operator)  # New operator gets a template file even before any CSV settles
+
+        current = list_operator_sources(state, os.path.join(base_directory, operator), now, settle_seconds)
+        for key, (signature, source) in current.items():
+            if signature is None:  # Loose CSV still being written
+                continue
+            if key not in known or known[key][0] != signature:
+                changed.append((operator, key, signature, source))
+
+        removed.extend((operator, key) for key in known if key not in current)
+
+    if not removed and not changed and not dirty:
+        return 0
+
+    for operator, key in removed:
+        _, partial = state["files"][operator].pop(key)
+        if partial is not None:
+            apply_partial(state, operator, partial, -1)
+        dirty.add(operator)
+
+    partials = parse_changed([source for *_, source in changed], executor)
+    for (operator, key, signature, _), partial in zip(changed, partials):
+        files = state["files"].setdefault(operator, {})
+        if key in files and files[key][1] is not None:
+            apply_partial(state, operator, files[key][1], -1)
+        files[key] = (signature, partial)  # A failed parse is retried once the file changes again
+        if partial is not None:
+            apply_partial(state, operator, partial, 1)
+        dirty.add(operator)
+
+    for operator in operators:
+        state["files"].setdefault(operator, {})
+    for operator in set(state["files"]) - set(operators):
+        del state["files"][operator]
+        state["operators"].pop(operator, None)
+
+    # Forget listings of ZIPs that no longer exist
+    for zip_path in [zip_path for zip_path in state["zips"] if not os.path.exists(zip_path)]:
+        del state["zips"][zip_path]
+
+    flush_templates(state, sorted(dirty), output_dir)
+    print(f"Applied {len(changed)} new or changed and {len(removed)} removed CSVs")
+    return len(changed) + len(removed)
+
+def watch(base_directory, output_dir, poll_interval=2.0, settle_seconds=2.0, workers=1, max_polls=None):
+    """Poll base_directory and keep the master templates in output_dir current until interrupted.
+
+    The first poll builds everything; later polls only parse new or changed files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    state = new_watch_state()
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    polls = 0
+
+    with executor or contextlib.nullcontext():
+        try:
+            while max_polls is None or polls < max_polls:
+                start = time.monotonic()
+                poll_once(state, base_directory, output_dir, executor, settle_seconds)
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(max(0.0, poll_interval - (time.monotonic() - start)))
+        except KeyboardInterrupt:
+            print("Watch stopped")
+
+    return state
+
+def main():
+    base_directory = "path/to/your/directory"  # Change this
+    output_dir = "path/to/output/directory"  # Change this
+    poll_interval = 2.0  # Seconds between scans of base_directory
+    settle_seconds = 2.0  # Files modified more recently than this are picked up on a later poll
+    workers = 1  # Parse large batches of new files in a process pool
+
+    watch(base_directory, output_dir, poll_interval, settle_seconds, workers)
+
+if __name__ == "__main__":
+    main()